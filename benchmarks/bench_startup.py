@@ -0,0 +1,76 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Startup benchmark: how long it takes to import the comms module, to make a
+# PlateCrane (no port opened yet) and to run a trivial headless program on
+# the dummy device. Each sample runs in a fresh interpreter so nothing is
+# already imported or cached in memory. The dummy device's simulated serial
+# latency is turned off, so the headless case measures start-up rather than
+# waiting on the link.
+#
+#   python3 benchmarks/bench_startup.py --runs 20
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import platecrane_comms"
+CONSTRUCT_SNIPPET = (
+    "from platecrane_comms import PlateCrane\n"
+    "PlateCrane(port='/dev/null')\n"
+)
+HEADLESS_SNIPPET = (
+    "import sys\n"
+    "import platecrane_comms\n"
+    "platecrane_comms.DummySerialDevice.latency = 0\n"
+    "import platecrane_headless\n"
+    "sys.exit(platecrane_headless.main(sys.argv[1:]))\n"
+)
+TRIVIAL_PROGRAM = "robot.getPosition()\n"
+
+
+def timeCommand(args):
+    start = time.perf_counter()
+    subprocess.run(args, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+def summarize(name, samples, baseline=0.0):
+    samples = sorted(s - baseline for s in samples)
+    median = samples[len(samples) // 2]
+    print(f"{name:<22} median {median * 1000:7.1f} ms  "
+          f"min {samples[0] * 1000:7.1f} ms  max {samples[-1] * 1000:7.1f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='measure PlateCrane startup')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as prog:
+        prog.write(TRIVIAL_PROGRAM)
+    try:
+        cases = [
+            ('interpreter', [sys.executable, '-c', 'pass']),
+            ('import comms', [sys.executable, '-c', IMPORT_SNIPPET]),
+            ('construct PlateCrane', [sys.executable, '-c', CONSTRUCT_SNIPPET]),
+            ('headless program', [
+                sys.executable, '-c', HEADLESS_SNIPPET, prog.name,
+                '--port', '', '--no-journal'
+            ]),
+        ]
+        results = {name: [timeCommand(cmd) for _ in range(args.runs)]
+                   for name, cmd in cases}
+    finally:
+        os.remove(prog.name)
+
+    # report everything on top of a bare interpreter start
+    baseline = sorted(results['interpreter'])[args.runs // 2]
+    print(f"python startup {baseline * 1000:.1f} ms, subtracted below")
+    for name, samples in results.items():
+        if (name != 'interpreter'):
+            summarize(name, samples, baseline)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
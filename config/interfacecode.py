@@ -16,6 +16,6 @@ sendDriverParams = False
 # Do not edit the next lines:
 from platecrane_comms import PlateCrane
 if __name__ == "__main__":
-    robot = plateCrane(port=plateCraneSerialPort, sendDriverParams=sendDriverParams)
+    robot = PlateCrane(port=plateCraneSerialPort, sendDriverParams=sendDriverParams)
     robot.reset()
 ####PLATECRANE_INTERFACE CODE END####
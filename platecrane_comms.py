@@ -1,74 +1,190 @@
-import serial
 import os
-import re
 import threading
 import time
-import logging
+from collections import deque, namedtuple
 
 NUM_IO = 48
 CMD_TERM = b'00\x10\r\n'
 
+# retry policy for the idempotent polling queries (GETPOS, READINP,
+# LISTPOINTS). anything else (motion, gripper, point edits) may already have
+# executed, so it is reported to the caller instead of being retried.
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.05 # seconds, doubled on every retry
+RECONNECT_MAX_DELAY = 2.0
 
+# command deadlines, in seconds. moves and jogs get a deadline derived from
+# their estimated duration (see _estimateMoveTime) when it can be worked out.
+DEFAULT_CMD_TIMEOUT = 10.0
+HOME_TIMEOUT = 120.0
+MOVE_TIMEOUT = 60.0 # used when a move's duration can't be estimated
+MOVE_TIMEOUT_FACTOR = 3.0
+MOVE_TIMEOUT_MARGIN = 5.0
+POINTS_TIMEOUT = 15.0
+CLOSE_TIMEOUT = 5.0
+
+# the background polls the serial worker runs; see pausePolling()
+POLLERS = ('position', 'inputs')
+# how long the worker sleeps when every poll is paused and nothing is queued;
+# new work wakes it straight away
+IDLE_WAIT = 0.1
+# extra time the caller allows the worker to notice an expired deadline
+CMD_TIMEOUT_GRACE = 1.0
+
+
+# logging, re and fnmatch are imported where they are first used, so that
+# importing this module stays cheap (see benchmarks/bench_startup.py)
+def _log():
+    import logging
+    return logging
+
+
+class PlateCraneError(Exception):
+    pass
+
+# the serial link misbehaved (bad echo, no response, port went away)
+class CommunicationError(PlateCraneError):
+    pass
+
+# a command was rejected by the robot or its outcome is unknown
+class CommandError(PlateCraneError):
+    pass
+
+# the robot didn't finish a command (or a points read) before its deadline
+class CommandTimeout(PlateCraneError):
+    pass
+
+
+# parse "r, y, z, p" as sent by GETPOS and LISTPOINTS into a list of ints.
+# returns None for missing or malformed values.
+def parseCoords(coords):
+    if not coords:
+        return None
+    if isinstance(coords, bytes):
+        coords = coords.decode('UTF-8', 'replace')
+    try:
+        return [int(v) for v in coords.split(',')]
+    except ValueError:
+        return None
+
+
+# everything the serial worker has read from the robot. the worker builds a
+# new snapshot for every update and swaps it in with a single assignment, so
+# readers get a consistent view without locking. snapshots (and the dicts in
+# them) must never be modified in place.
+RobotState = namedtuple('RobotState', [
+    'posnStr',
+    'posnTime', # when posnStr was read
+    'ioStrs',
+    'ioTimes', # when each input in ioStrs was read
+    'pointStrs',
+    'time',
+])
+
+# what the controller's settings are believed to be, from commands it
+# confirmed. None means unknown: never set, or forgotten after a reset or an
+# error. set-commands that wouldn't change anything are skipped.
+ControllerShadow = namedtuple('ControllerShadow', [
+    'speed',
+    'gripStrength',
+    'limp',
+    'gripperClosed',
+    'lastPoint', # point the last completed full move went to
+])
+UNKNOWN_SHADOW = ControllerShadow(None, None, None, None, None)
+
+
+# simulated controller for running without a robot (port ""). it keeps a
+# point table and a position, so teaching, bulk point edits, moves and jogs
+# can be exercised; every other command just succeeds. inputs read 0 unless
+# set in 'inputs'.
 class DummySerialDevice:
+    latency = 0.04 # seconds per line read
+    
     def __init__(self, port, baudrate, timeout=0):
-        self.last_command = b""
+        self.position = [1, 3, 5, 7]
+        self.points = {'dummy': [0, 0, 0, 0]}
+        self.inputs = {}
+        self.lines = [] # echo and response still to be read
     
     def write(self, data):
         print(f"(DummySerialDevice) robot received: {data}")
-        self.last_command = data
+        self.lines = [data] + self._respond(data)
+    
+    def _respond(self, data):
+        cmd, _, args = data.decode('UTF-8', 'replace').strip().partition(' ')
+        if not cmd:
+            return []
+        if (cmd == 'GETPOS'):
+            return [self._coords(self.position)]
+        if (cmd == 'LISTPOINTS'):
+            return [
+                bytes(name, 'UTF-8') + b',' + self._coords(coords, ' ')
+                for name, coords in self.points.items()
+            ] + [b'\r\n']
+        if (cmd == 'READINP'):
+            return [bytes(str(self.inputs.get(int(args), 0)), 'UTF-8') + b'\r\n']
+        if (cmd == 'CLEARPOINTS'):
+            self.points = {}
+            return []
+        
+        if (cmd == 'SETPOINT'):
+            name, values = args.split(',', 1)
+            self.points[name.strip()] = [int(v) for v in values.split(',')]
+        elif (cmd == 'HERE'):
+            self.points[args] = list(self.position)
+        elif (cmd == 'DELETEPOINT'):
+            self.points.pop(args, None)
+        elif (cmd == 'JOG'):
+            axis, dist = args.split(',')
+            self.position[PlateCrane.axes.index(axis)] += int(dist)
+        elif cmd.startswith('MOVE') and args in self.points:
+            target = self.points[args]
+            if (cmd == 'MOVE'):
+                self.position = list(target)
+            else:
+                i = PlateCrane.axes.index(cmd[5:])
+                self.position[i] = target[i]
+        return [CMD_TERM]
+    
+    def _coords(self, coords, prefix=''):
+        return bytes(prefix + ', '.join(str(v) for v in coords), 'UTF-8') + b'\r\n'
     
     def flush(self):
         print("(DummySerialDevice) (flush)")
         pass
     
     def readline(self):
-        time.sleep(0.04)
-        echo = self.last_command
-        if (echo == b'LISTPOINTS\r\n'):
-            self.last_command = b"dummy, 0, 0, 0, 0\r\n"
-        elif (echo == b"dummy, 0, 0, 0, 0\r\n"):
-            self.last_command = b"\r\n"
-        elif (echo == b'GETPOS\r\n'):
-            self.last_command = b'1, 3, 5, 7\r\n'
-        elif len(echo):
-            self.last_command = CMD_TERM
-        else:
-            self.last_command = b''
-        print(f"(DummySerialDevice) robot wrote: {echo}")
-        return echo
+        time.sleep(self.latency)
+        line = self.lines.pop(0) if self.lines else b''
+        print(f"(DummySerialDevice) robot wrote: {line}")
+        return line
     
     def readall(self):
         time.sleep(0.01)
-        self.last_command = ""
-        return ""
+        self.lines = []
+        return b''
     
     def close(self):
-        self.last_command = ""
+        self.lines = []
 
 class PlateCrane:
-    areMotorsOff = False
     axes = ['R', 'Y', 'Z', 'P']
     
     command = None
+    cmdDeadline = None
     expectedResponse = CMD_TERM # set to * to save response to receivedResponse
     receivedResponse = None
     ignoreEcho = False # for the special case of exiting TERMINAL mode
-    cmdLock = threading.Lock()
     error = None
     
-    pointStrs = {}
-    pointsRead = False
-    pointsLock = threading.Lock()
-    
-    posnStr = b'0, 0, 0, 0\r\n'
-    posnLock = threading.Lock()
-    
-    ioStrs = {}
-    ioLock = threading.Lock()
-    
     fastIoNum = -1
     
     _workerThread = None
+    _telemetry = None
+    
+    # RunJournal to record command timings to (see platecrane_journal.py)
+    journal = None
     
     def _writeWithEcho(self, data):
         self._s.write(data)
@@ -77,129 +193,452 @@ class PlateCrane:
             return
         echo = self._s.readline()
         if (echo != data):
-            raise ValueError(f'robot communication error: got {str(echo)}')
+            raise CommunicationError(
+                f'robot communication error: got {str(echo)}'
+            )
+    
+    # throw away anything still in flight so the next echo lines up
+    def _resync(self):
+        self._s.readall()
     
+    # send an idempotent query and read its response with readResponse,
+    # resynchronizing and retrying with backoff on framing errors
+    def _query(self, data, readResponse):
+        delay = RETRY_BACKOFF
+        for attempt in range(MAX_RETRIES):
+            try:
+                self._writeWithEcho(data)
+                return readResponse()
+            except CommunicationError as e:
+                _log().warning(f'{data}: {e} (attempt {attempt + 1})')
+                self._resync()
+                time.sleep(delay)
+                delay *= 2
+        
+        raise CommunicationError(f'{data}: no valid response from robot')
+    
+    # only the worker thread may call this
+    def _publish(self, **changes):
+        self._state = self._state._replace(time=time.time(), **changes)
     
     def _readPoints(self):
-        self._writeWithEcho(b'LISTPOINTS\r\n')
-        hasInvalidPoints = False
+        self._pointsError = None
+        self._badPointReads = []
+        try:
+            self._publish(
+                pointStrs=self._query(b'LISTPOINTS\r\n', self._readPointsList)
+            )
+        except CommunicationError as e:
+            if self._pointsCorrupted():
+                self._clearPoints()
+            else:
+                _log().warning(str(e))
+                self._pointsError = e
+        finally:
+            # always let getPoints() return, even if the read failed
+            self._pointsRead.set()
+    
+    # if the controller is powered on without a CMOS battery, the points
+    # contain random ASCII data. unlike line noise, that comes back the same
+    # on every read.
+    def _pointsCorrupted(self):
+        reads = self._badPointReads
+        return (len(reads) == MAX_RETRIES and all(r == reads[0] for r in reads))
+    
+    def _clearPoints(self):
+        print('Invalid points found in points list, clearing')
+        self._s.write(b'CLEARPOINTS\r\n')
+        self._s.readall()
+        self._publish(pointStrs={})
+    
+    def _readPointsList(self):
+        import re
+        pointStrs = {}
+        badLines = []
         
         while True:
             resp = self._s.readline()
             
             if not resp:
-                raise ValueError('robot timeout when reading points')
+                raise CommunicationError('robot timeout when reading points')
             if (resp == b'\r\n'):
                 break
             try:
                 name, values = str(resp[:-2])[2:-1].split(',', 1)
             except ValueError:
-                hasInvalidPoints = True
+                badLines.append(resp)
                 continue
-            # if the controller is powered on without a CMOS battery,
-            # the points will contain random ASCII data which can
-            # break the name/values parsing. If values is malformed,
-            # skip and move to the next line.
             if not re.match(r' [-\d]+, [-\d]+, [-\d]+, [-\d]+', values):
-                hasInvalidPoints = True
+                badLines.append(resp)
                 continue
-            self.pointStrs[name] = values
+            pointStrs[name] = values
         
-        # if bad data was returned from LISTPOINTS, clear points list
-        if hasInvalidPoints:
-            print('Invalid points found in points list, clearing')
-            self._s.write(b'CLEARPOINTS\r\n')
-            self.pointStrs = {}
-            self._s.readall()
+        # garbled lines are usually line noise, so read again (see _query);
+        # _readPoints() decides whether the table itself is corrupted
+        if badLines:
+            self._badPointReads.append(badLines)
+            raise CommunicationError(f'malformed point: {str(badLines[0])}')
         
-        self.pointsRead = True
+        return pointStrs
+    
+    def _readPosnResponse(self):
+        import re
+        resp = self._s.readline()
+        if not re.match(rb'[-\d]+, [-\d]+, [-\d]+, [-\d]+\r\n', resp):
+            raise CommunicationError(f'bad position: {str(resp)}')
+        return resp
     
     def _readPosn(self):
-        self._writeWithEcho(b'GETPOS\r\n')
-        self.posnStr = self._s.readline()
+        posnStr = self._query(b'GETPOS\r\n', self._readPosnResponse)
+        self._publish(posnStr=posnStr, posnTime=time.time())
+    
+    def _readIOResponse(self):
+        resp = self._s.readline()
+        if not resp:
+            raise CommunicationError('robot timeout when reading input')
+        return resp
+    
+    # send self.command and wait for its response. sets self.error on failure.
+    def _sendCmd(self):
+        try:
+            self._writeWithEcho(self.command)
+        except CommunicationError as e:
+            # the robot may or may not have acted on a garbled command,
+            # so report it rather than risk running a move twice
+            self._resync()
+            self.error = CommandError(f'{self.command}: {e}')
+            return
+        
+        if (self.expectedResponse):
+            resp = None
+            while not resp:
+                if (time.monotonic() > self.cmdDeadline):
+                    # free the link; a late response is drained by the
+                    # next resync
+                    self.error = CommandTimeout(
+                        f'{self.command}: no response from robot'
+                    )
+                    return
+                resp = self._s.readline()
+            
+            if (self.expectedResponse == '*'):
+                self.receivedResponse = resp
+            elif (resp != self.expectedResponse):
+                msg = f'{self.command}: unexpected robot response: '
+                msg += str(resp)
+                msg += f'\n(expected {self.expectedResponse})'
+                self.error = CommandError(msg)
     
     def _sendCmdIfAny(self):
         if self.command:
             self.error = None
-            self._writeWithEcho(self.command)
+            if self._telemetry:
+                # let readers see the robot is busy while the batch runs
+                self._publishTelemetry()
+            # commands queued together by _addCmds() are sent back to back,
+            # without polling in between, stopping at the first error
+            while True:
+                sent = time.monotonic()
+                self._sendCmd()
+                self.cmdTimes.append((sent, time.monotonic()))
+                if self.error or not self.cmdQueue:
+                    break
+                self.command = self.cmdQueue.pop(0)
             
-            if (self.expectedResponse):
-                resp = None
-                while not resp:
-                    try:
-                        resp = self._s.readline()
-                    except serial.timeout:
-                        pass
-                
-                if (self.expectedResponse == '*'):
-                    self.receivedResponse = resp
-                elif (resp != self.expectedResponse):
-                    msg = f'{self.command}: unexpected robot response: '
-                    msg += str(resp)
-                    msg += f'\n(expected {self.expectedResponse})'
-                    self.error = msg
-
-            self.command = None
+            self._finishCmd()
+    
+    def _finishCmd(self):
+        self.command = None
+        self.cmdQueue = []
+        self._cmdDone.set()
+    
+    # abort the command in flight (if any) so _addCmd() doesn't wait forever
+    def _failCmd(self, error):
+        if self.command:
+            self.error = error
+            self._finishCmd()
     
     def _readIO(self, ioToRead):
         inpStr = bytes(str(ioToRead), 'UTF-8')
-        self._writeWithEcho(b'READINP ' + inpStr + b'\r\n')
-        self.ioStrs[ioToRead] = self._s.readline()
-    
+        resp = self._query(b'READINP ' + inpStr + b'\r\n', self._readIOResponse)
+        ioStrs = dict(self._state.ioStrs)
+        ioStrs[ioToRead] = resp
+        ioTimes = dict(self._state.ioTimes)
+        ioTimes[ioToRead] = time.time()
+        self._publish(ioStrs=ioStrs, ioTimes=ioTimes)
     
-    def _serialWorker(self):
-        currIoRead = 0
+    # reopen the port after a USB disconnect, backing off between attempts
+    def _reconnect(self):
+        _log().warning('robot link lost, reopening port')
+        try:
+            self._s.close()
+        except OSError:
+            pass
         
+        delay = RETRY_BACKOFF
         while self._runWorker:
-            if self.pointsLock.acquire(blocking=False):
-                self._readPoints()
-                self.pointsLock.release()
-                
-            if self.posnLock.acquire(blocking=False):
-                self._readPosn()
-                self.posnLock.release()
+            time.sleep(delay)
+            try:
+                self.portInit()
+                # a link that is still flapping often fails straight away
+                self._resync()
+            except OSError as e:
+                _log().info(f'reconnect failed: {e}')
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
             
-            if self.cmdLock.acquire(blocking=False):
+            # the controller may have been power cycled, losing its settings
+            self._shadow = UNKNOWN_SHADOW
+            _log().warning('robot link reopened')
+            return
+    
+    def _serviceLink(self):
+        if self._pointsRequested.is_set():
+            self._pointsRequested.clear()
+            self._readPoints()
+        
+        # one-off reads for readInput(), whether or not inputs are polled
+        while self._inputRequests:
+            try:
+                self._readIO(self._inputRequests.popleft())
+            except CommunicationError as e:
+                _log().warning(str(e))
+        
+        if self._polling['position'].is_set():
+            try:
+                self._readPosn()
+            except CommunicationError as e:
+                _log().warning(str(e))
+        
+        if self.cmdLock.acquire(blocking=False):
+            try:
                 self._sendCmdIfAny()
+            finally:
                 self.cmdLock.release()
-            
-            if self.ioLock.acquire(blocking=False):
+        
+        if self._polling['inputs'].is_set():
+            try:
                 # we scan one input at a time to reduce loop time.
                 # setting fastIoNum >= 0 will cause that input to read every loop
                 # (and ignore all the others), used when seeking.
                 if (self.fastIoNum >= 0):
                     self._readIO(self.fastIoNum)
                 else:
-                    self._readIO(currIoRead)
-                    if (currIoRead >= NUM_IO):
-                        currIoRead = 0
+                    self._readIO(self._currIoRead)
+                    if (self._currIoRead >= NUM_IO):
+                        self._currIoRead = 0
                     else:
-                        currIoRead += 1
-                
-                self.ioLock.release()
-            
-        self._workerFinished = True
+                        self._currIoRead += 1
+            except CommunicationError as e:
+                _log().warning(str(e))
+    
+    def _publishTelemetry(self):
+        from platecrane_telemetry import CMD_IDLE, CMD_BUSY, CMD_ERROR
+        
+        state = self._state
+        if self.command:
+            cmdState = CMD_BUSY
+        elif self.error:
+            cmdState = CMD_ERROR
+        else:
+            cmdState = CMD_IDLE
+        # only publish what changed, so a loop that read nothing (e.g. with
+        # polling paused) doesn't push real samples out of the ring
+        last = self._lastTelemetry
+        if last and (last[0] is state) and (last[1] == cmdState):
+            return
+        self._lastTelemetry = (state, cmdState)
+        
+        inputs = 0
+        inputsRead = 0
+        for num, resp in state.ioStrs.items():
+            try:
+                isOn = int(resp)
+            except ValueError:
+                continue
+            inputsRead |= 1 << num
+            if isOn:
+                inputs |= 1 << num
+        
+        self._telemetry.publish(
+            parseCoords(state.posnStr) or [0] * len(self.axes),
+            inputs,
+            inputsRead,
+            cmdState
+        )
+    
+    # nothing to poll and nothing asked for
+    def _isIdle(self):
+        return not (
+            self.command
+            or self._pointsRequested.is_set()
+            or self._inputRequests
+            or any(polling.is_set() for polling in self._polling.values())
+        )
+    
+    def _serialWorker(self):
+        self._currIoRead = 0
+        
+        while self._runWorker:
+            try:
+                # cleared before looking for work, so work queued from here
+                # on cuts the idle wait short
+                self._wake.clear()
+                self._serviceLink()
+                if self._telemetry:
+                    self._publishTelemetry()
+                if self._isIdle():
+                    self._wake.wait(IDLE_WAIT)
+            except OSError as e:
+                # serial.SerialException is an OSError; USB adapters raise it
+                # when unplugged or power cycled
+                self._failCmd(CommunicationError(f'robot link lost: {e}'))
+                self._reconnect()
+            except Exception as e:
+                # never let the worker die, or every later command hangs
+                _log().exception('robot worker error')
+                self._failCmd(CommunicationError(f'robot worker error: {e}'))
+    
+    def _addCmd(self, cmd, block=True, timeout=DEFAULT_CMD_TIMEOUT):
+        self._addCmds([cmd], block, timeout)
     
-    def _addCmd(self, cmd, block=True):
+    # queue several commands to be sent back to back. 'timeout' covers the
+    # whole batch, and the first error stops it. callers are served one at a
+    # time: a second caller waits (within its own timeout) until the first
+    # one's batch has finished, so neither can overwrite the other's command.
+    def _addCmds(self, cmds, block=True, timeout=DEFAULT_CMD_TIMEOUT):
         if not self._runWorker:
-            raise Exception("The robot is not connected!")
+            raise PlateCraneError("The robot is not connected!")
         
-        logging.info(f'sending "{cmd}"')
+        cmd = b', '.join(cmds)
+        # time spent waiting behind other callers counts as queue time
+        queued = time.monotonic()
+        if not self._callerLock.acquire(timeout=timeout + CMD_TIMEOUT_GRACE):
+            raise CommandTimeout(f'{cmd}: robot busy with another command')
+        try:
+            # a non-blocking batch may still be running
+            if self.command and not self._cmdDone.wait(timeout + CMD_TIMEOUT_GRACE):
+                raise CommandTimeout(f'{cmd}: robot busy with another command')
+            self._sendBatch(cmds, cmd, block, timeout, queued)
+        finally:
+            self._callerLock.release()
+    
+    # called with self._callerLock held
+    def _sendBatch(self, cmds, cmd, block, timeout, queued):
+        _log().info(f'sending "{cmd}"')
         self.cmdLock.acquire()
-        self.command = cmd + b'\r\n'
+        self.command = cmds[0] + b'\r\n'
+        self.cmdQueue = [c + b'\r\n' for c in cmds[1:]]
+        self.cmdTimes = cmdTimes = []
+        self.cmdDeadline = time.monotonic() + timeout
+        self.error = None
+        self._cmdDone.clear()
         self.cmdLock.release()
+        self._wake.set()
         
-        if block:
-            while self.command:
-                time.sleep(0.05)
+        if not block:
+            return
+        
+        if not self._cmdDone.wait(timeout + CMD_TIMEOUT_GRACE):
+            # the worker never picked the command up (e.g. it is busy
+            # reconnecting), so withdraw it ourselves
+            if self.cmdLock.acquire(timeout=CMD_TIMEOUT_GRACE):
+                self._failCmd(CommandTimeout(
+                    f'{self.command}: robot link busy'
+                ))
+                self.cmdLock.release()
+            if not self.error:
+                self.error = CommandTimeout(f'{cmd}: robot link busy')
+        
+        if self.journal:
+            self.journal.recordBatch(cmds, queued, cmdTimes, self.error)
         
         if self.error:
-            raise ValueError(self.error)
+            # we can't tell what state the controller was left in
+            self._shadow = UNKNOWN_SHADOW
+            raise self.error
+    
+    # send a command that sets controller state, unless the shadow says it is
+    # already set. the shadow is updated once the robot confirms the command.
+    def _addSetCmd(self, cmd, **changes):
+        if all(getattr(self._shadow, k) == v for k, v in changes.items()):
+            _log().info(f'skipping redundant "{cmd}"')
+            return
+        
+        self._addCmd(cmd)
+        self._shadow = self._shadow._replace(**changes)
+    
+    # seconds needed to move between two positions at the current speed,
+    # or None if the axis speeds or the speed setting aren't known
+    def _estimateMoveTime(self, start, end):
+        speedPct = self._shadow.speed
+        if not self._axisSpeeds or not speedPct:
+            return None
+        
+        return max(
+            abs(e - s) / (v * speedPct / 100)
+            for s, e, v in zip(start, end, self._axisSpeeds)
+        )
+    
+    # counts 'axis' travels in 'seconds' at the current speed, or None if
+    # the axis speeds or the speed setting aren't known
+    def axisTravel(self, axis, seconds):
+        speedPct = self._shadow.speed
+        if not self._axisSpeeds or not speedPct:
+            return None
+        return self._axisSpeeds[self.axes.index(axis)] * speedPct / 100 * seconds
+    
+    def _motionTimeout(self, start, end):
+        estimate = None
+        if start and end:
+            estimate = self._estimateMoveTime(start, end)
+        if estimate is None:
+            return MOVE_TIMEOUT
+        return estimate * MOVE_TIMEOUT_FACTOR + MOVE_TIMEOUT_MARGIN
+    
+    # SETSPEEDS in system.params gives the full speed of each axis, in the
+    # same order as the values from GETPOS
+    def _loadAxisSpeeds(self):
+        try:
+            with open(os.path.join(self._configPath, 'system.params'), 'r') as spFile:
+                for line in spFile:
+                    if line.startswith('SETSPEEDS '):
+                        return [int(v) for v in line[10:].split(',')]
+        except (OSError, ValueError):
+            pass
+        return None
+    
+    # WorkspaceLimits from SETLIMITS in system.params, or None if they can't
+    # be loaded. limit checks need numpy, which is optional.
+    def _loadLimits(self):
+        from platecrane_limits import WorkspaceLimits
+        try:
+            return WorkspaceLimits.fromConfig(self._configPath)
+        except ImportError:
+            _log().info('numpy not installed, workspace limits not checked')
+            return None
+        except (OSError, ValueError):
+            return None
     
     
     def __init__(self, port='/dev/ttyUSB0', config='config/', sendDriverParams=False):
-        # pointsLock is normally locked
-        self.pointsLock.acquire()
+        self._state = RobotState(b'0, 0, 0, 0\r\n', None, {}, {}, {}, None)
+        self.cmdLock = threading.Lock() # shared with the serial worker
+        self._callerLock = threading.Lock() # one _addCmds() caller at a time
+        self.cmdQueue = [] # rest of a batch from _addCmds()
+        self.cmdTimes = [] # (sent, done) for each command of the batch sent so far
+        
+        # points are only read on request (see getPoints); the other pollers
+        # run until paused
+        self._pointsRequested = threading.Event()
+        self._pointsRead = threading.Event()
+        self._polling = {poller: threading.Event() for poller in POLLERS}
+        self._inputRequests = deque() # inputs readInput() is waiting for
+        self._wake = threading.Event() # set when the worker has work to do
+        self._pointsError = None # why the last points read failed
+        self._badPointReads = [] # malformed lines from each try of that read
+        self.resumePolling()
+        self.areMotorsOff = False
         
         self.fastIoNum = 22
         self.sendDriverParams = sendDriverParams
@@ -207,19 +646,35 @@ class PlateCrane:
         self._port = port
         
         self._runWorker = False
+        self._cmdDone = threading.Event()
         
-        # enable debugging with dummy device
-        self.portInit()
+        # the port is opened by reset() (or an explicit portInit()), so
+        # creating a PlateCrane is cheap
+        self._s = None
         
         self._configPath = config
+        self._axisSpeeds = self._loadAxisSpeeds()
+        self._limits = None
+        self._limitsLoaded = False
+        self._shadow = UNKNOWN_SHADOW
+    
+    # WorkspaceLimits, loaded on first use since it pulls in numpy
+    @property
+    def limits(self):
+        if not self._limitsLoaded:
+            self._limits = self._loadLimits()
+            self._limitsLoaded = True
+        return self._limits
     
     def portInit(self):
         # enable debugging with dummy device
         if (self._port == ""):
             self._s = DummySerialDevice(self._port, 9600, timeout=0.25)
         else:
+            # pyserial is only needed once a real port is opened
+            import serial
             self._s = serial.Serial(self._port, 9600, timeout=0.25)
-    
+
     # the Y- and P-axis drivers lose their params on startup, so
     # we re-send them here
     def driverInit(self):
@@ -251,6 +706,7 @@ class PlateCrane:
     
     # set "resume" to True to avoid sending anything to the robot
     def reset(self, resume=False):
+        self._shadow = UNKNOWN_SHADOW
         if not self._s:
             self.portInit()
         
@@ -264,48 +720,113 @@ class PlateCrane:
                 target=self._serialWorker,
                 daemon=True
             )
-            self._workerFinished = False
             self._runWorker = True
             self._workerThread.start()
         
         if not resume:
-            self._addCmd(b'HOME')
+            self._addCmd(b'HOME', timeout=HOME_TIMEOUT)
+    
+    # publish the worker's state to a shared-memory ring whenever it reads
+    # something or a command starts or ends, for local readers (see
+    # platecrane_telemetry.py). each robot on a machine needs its own name;
+    # FileExistsError if the name is in use.
+    def publishTelemetry(self, name='platecrane', slots=256):
+        from platecrane_telemetry import TelemetryWriter
+        self._lastTelemetry = None
+        self._telemetry = TelemetryWriter(name, slots)
+    
+    # latest RobotState snapshot published by the serial worker
+    def getState(self):
+        return self._state
+    
+    # ControllerShadow of the controller's settings
+    def getShadow(self):
+        return self._shadow
+    
+    # forget the shadowed settings, e.g. after talking to the controller
+    # some other way. the next set-commands are sent unconditionally.
+    def invalidateShadow(self):
+        self._shadow = UNKNOWN_SHADOW
+    
+    # stop/restart background polls, e.g. pausePolling('inputs').
+    # with no arguments, applies to all pollers in POLLERS.
+    def pausePolling(self, *pollers):
+        for poller in pollers or POLLERS:
+            self._polling[poller].clear()
+    
+    def resumePolling(self, *pollers):
+        for poller in pollers or POLLERS:
+            self._polling[poller].set()
+        self._wake.set()
+    
+    def isPolling(self, poller):
+        return self._polling[poller].is_set()
     
     def getPosition(self):
-        return str(self.posnStr[:-2]).strip("'b")
+        return str(self._state.posnStr[:-2]).strip("'b")
     
     #TODO: getInput(input) to replace getInputs()?
     def getInputs(self):
-        return str(self.ioStrs) \
+        return str(self._state.ioStrs) \
             .strip("{}") \
             .replace(",", " ") \
             .replace("\\r\\n", "") \
             .replace("b", "") \
             .replace("'", "")
     
+    # have the serial worker read an input afresh and return its value
+    def readInput(self, num, timeout=DEFAULT_CMD_TIMEOUT):
+        requested = time.time()
+        deadline = time.monotonic() + timeout
+        self._inputRequests.append(num)
+        self._wake.set()
+        while True:
+            state = self._state
+            if (state.ioTimes.get(num, 0) > requested):
+                try:
+                    return int(state.ioStrs[num])
+                except ValueError:
+                    raise CommunicationError(
+                        f'bad input {num} value: {state.ioStrs[num]}'
+                    )
+            if (time.monotonic() > deadline):
+                raise CommandTimeout(f'input {num} was not read in time')
+            time.sleep(0.01)
+    
     def motorsOff(self):
         self.areMotorsOff = True
-        self.posnLock.acquire()
-        self.ioLock.acquire()
-        self._addCmd(b'LIMP 0')
+        self.pausePolling('position', 'inputs')
+        # the arm can be moved by hand from here on
+        self._addSetCmd(b'LIMP 0', limp=True, lastPoint=None)
     
     def motorsOn(self):
-        self._addCmd(b'LIMP 1')
+        self._addSetCmd(b'LIMP 1', limp=False)
         if self.areMotorsOff:
-            self.posnLock.release()
-            self.ioLock.release()
+            self.resumePolling('position', 'inputs')
             self.areMotorsOff = False
     
     def speed(self, speed):
         if (speed < 0 or speed > 100):
             raise ValueError('speed must be 0-100')
-        self._addCmd(b'SPEED ' + bytes(str(speed), 'UTF-8'))
+        self._addSetCmd(b'SPEED ' + bytes(str(speed), 'UTF-8'), speed=speed)
     
-    def jog(self, axis, dist):
+    def jog(self, axis, dist, timeout=None):
         if axis not in self.axes:
             raise ValueError('invalid axis')
+        # the polled position can lag a command behind, so this can miss the
+        # last jog before a limit; the controller still enforces its own.
+        # it is stale while polling is paused, so don't check then.
+        state = self._state
+        position = parseCoords(state.posnStr) if state.time else None
+        if self.limits and position and self.isPolling('position'):
+            self.limits.checkJog(position, axis, dist)
+        
+        if timeout is None:
+            delta = [dist if a == axis else 0 for a in self.axes]
+            timeout = self._motionTimeout([0] * len(self.axes), delta)
+        self._shadow = self._shadow._replace(lastPoint=None)
         self._addCmd(b'JOG ' + bytes(axis, 'UTF-8') + b','
-            + bytes(str(dist), 'UTF-8'))
+            + bytes(str(dist), 'UTF-8'), timeout=timeout)
     
     def here(self, pointName):
         self._addCmd(b'HERE ' + bytes(pointName, 'UTF-8'))
@@ -313,11 +834,115 @@ class PlateCrane:
     def clear(self, pointName):
         self._addCmd(b'DELETEPOINT ' + bytes(pointName, 'UTF-8'))
     
+    # define a point from coordinates, given in the same order as GETPOS
+    # and LISTPOINTS
+    def setPoint(self, pointName, coords):
+        self._addCmd(self._setPointCmd(pointName, coords))
+    
+    def _setPointCmd(self, pointName, coords):
+        values = ', '.join(str(int(v)) for v in coords)
+        return bytes(f'SETPOINT {pointName}, {values}', 'UTF-8')
+    
+    # read the point table back once after a bulk edit and check that every
+    # point in 'expected' ({name: coords}) is there and the deleted ones aren't
+    def _verifyPoints(self, expected, deleted=()):
+        pointStrs = self.getPoints()
+        wrong = [
+            name for name, coords in expected.items()
+            if (parseCoords(pointStrs.get(name)) != coords)
+        ]
+        wrong += [name for name in deleted if name in pointStrs]
+        if wrong:
+            raise CommandError(f'points not updated: {", ".join(sorted(wrong))}')
+    
+    # the last full move's point no longer says where the arm is once it has
+    # been redefined or deleted
+    def _forgetPoints(self, names):
+        if self._shadow.lastPoint in names:
+            self._shadow = self._shadow._replace(lastPoint=None)
+    
+    # define many points ({name: coords}, e.g. from platecrane_points) as one
+    # pipelined batch. the points are checked against the workspace limits
+    # before anything is sent, and the point table is read back once at the
+    # end unless 'verify' is False.
+    def setPoints(self, points, verify=True, timeout=None):
+        if not points:
+            return
+        points = {name: [int(v) for v in coords] for name, coords in points.items()}
+        
+        if self.limits:
+            problems = self.limits.checkPoints({
+                name: ', '.join(str(v) for v in coords)
+                for name, coords in points.items()
+            })
+            if problems:
+                from platecrane_limits import LimitError
+                raise LimitError('\n'.join(problems.values()))
+        
+        if timeout is None:
+            timeout = DEFAULT_CMD_TIMEOUT * len(points)
+        self._forgetPoints(points)
+        self._addCmds(
+            [self._setPointCmd(name, coords) for name, coords in points.items()],
+            timeout=timeout
+        )
+        if verify:
+            self._verifyPoints(points)
+    
+    # delete every point whose name matches a shell-style pattern (e.g.
+    # 'rack1_*') as one batch. returns the names deleted. a plain name is
+    # deleted without listing the points first.
+    def deletePoints(self, pattern, verify=True, timeout=None):
+        if any(c in pattern for c in '*?['):
+            import fnmatch
+            names = sorted(fnmatch.filter(self.getPoints(), pattern))
+        else:
+            names = [pattern]
+        if not names:
+            return []
+        
+        if timeout is None:
+            timeout = DEFAULT_CMD_TIMEOUT * len(names)
+        self._forgetPoints(names)
+        self._addCmds(
+            [b'DELETEPOINT ' + bytes(name, 'UTF-8') for name in names],
+            timeout=timeout
+        )
+        if verify:
+            self._verifyPoints({}, names)
+        return names
+    
+    def renamePoint(self, oldName, newName, verify=True):
+        coords = parseCoords(self.getPoints().get(oldName))
+        if not coords:
+            raise PlateCraneError(f'{oldName} is not a taught point')
+        
+        self._forgetPoints([newName])
+        self._addCmds([
+            self._setPointCmd(newName, coords),
+            b'DELETEPOINT ' + bytes(oldName, 'UTF-8')
+        ], timeout=DEFAULT_CMD_TIMEOUT * 2)
+        if (self._shadow.lastPoint == oldName):
+            self._shadow = self._shadow._replace(lastPoint=newName)
+        if verify:
+            self._verifyPoints({newName: coords}, [oldName])
+    
     # control the movement sequence with the optional 'axes' parameter.
     # move('home', axes=['Z', '*']) # move Z axis first, then move rest of axes
     # move('home', axes=['Y']) # only move Y axis
-    def move(self, pointName, axes=None):
+    # 'timeout' covers the whole sequence; by default it is estimated from
+    # the distance to the point and the current speed.
+    def move(self, pointName, axes=None, timeout=None):
         axes = ['*'] if not axes else axes
+        if timeout is None:
+            state = self._state
+            timeout = self._motionTimeout(
+                parseCoords(state.posnStr),
+                parseCoords(state.pointStrs.get(pointName))
+            ) * len(axes)
+        deadline = time.monotonic() + timeout
+        
+        self._shadow = self._shadow._replace(lastPoint=None)
         for axis in axes:
             if (axis == '*'):
                 move_command = b'MOVE '
@@ -325,43 +950,142 @@ class PlateCrane:
                 move_command = b'MOVE_' + bytes(axis, 'UTF-8') + b' '
             else:
                 raise ValueError("invalid axis")
-            self._addCmd(move_command + bytes(pointName, 'UTF-8'))
+            cmd = move_command + bytes(pointName, 'UTF-8')
+            # don't start a move that has no time left to finish
+            remaining = deadline - time.monotonic()
+            if (remaining <= 0):
+                raise CommandTimeout(f'{cmd}: move sequence ran out of time')
+            self._addCmd(cmd, timeout=remaining)
+        
+        if (axes[-1] == '*'):
+            self._shadow = self._shadow._replace(lastPoint=pointName)
+    
+    # the shadow once a raw command has run. anything not recognised may
+    # have changed any setting, so the shadow is forgotten.
+    def _shadowAfter(self, shadow, cmd):
+        name, _, arg = cmd.partition(' ')
+        if (name == 'MOVE'):
+            return shadow._replace(lastPoint=arg)
+        if name.startswith('MOVE_') or (name == 'JOG'):
+            return shadow._replace(lastPoint=None)
+        if (cmd == 'CLOSE'):
+            return shadow._replace(gripperClosed=True)
+        if (cmd == 'OPEN'):
+            return shadow._replace(gripperClosed=False)
+        if (cmd == 'LIMP 0'):
+            return shadow._replace(limp=True, lastPoint=None)
+        if (cmd == 'LIMP 1'):
+            return shadow._replace(limp=False)
+        
+        try:
+            value = int(arg)
+        except ValueError:
+            return UNKNOWN_SHADOW
+        if (name == 'SPEED'):
+            return shadow._replace(speed=value)
+        if (name == 'SETGRIPSTRENGTH'):
+            return shadow._replace(gripStrength=value)
+        return UNKNOWN_SHADOW
+    
+    # run raw controller commands (e.g. ['MOVE_Z A', 'MOVE A', 'CLOSE']) as
+    # one pipelined batch. by default every move is allowed MOVE_TIMEOUT.
+    # set-commands (SPEED, SETGRIPSTRENGTH, LIMP) update the shadow.
+    def runSequence(self, cmds, timeout=None):
+        if not cmds:
+            return
+        
+        if timeout is None:
+            timeout = sum(
+                MOVE_TIMEOUT if cmd.startswith(('MOVE', 'JOG'))
+                else DEFAULT_CMD_TIMEOUT
+                for cmd in cmds
+            )
+        
+        shadow = self._shadow
+        for cmd in cmds:
+            shadow = self._shadowAfter(shadow, cmd)
+        
+        self._shadow = self._shadow._replace(lastPoint=None)
+        self._addCmds([bytes(cmd, 'UTF-8') for cmd in cmds], timeout=timeout)
+        self._shadow = shadow
+    
+    # move through several points as one pipelined batch: each MOVE is sent
+    # as soon as the previous one finishes, without round trips to the caller
+    # or polling in between. 'timeout' covers the whole path.
+    def moveThrough(self, pointNames, timeout=None):
+        if not pointNames:
+            return
+        
+        if timeout is None:
+            state = self._state
+            coords = [parseCoords(state.posnStr)] + [
+                parseCoords(state.pointStrs.get(p)) for p in pointNames
+            ]
+            timeout = sum(
+                self._motionTimeout(start, end)
+                for start, end in zip(coords, coords[1:])
+            )
+        
+        self._shadow = self._shadow._replace(lastPoint=None)
+        self._addCmds(
+            [b'MOVE ' + bytes(p, 'UTF-8') for p in pointNames],
+            timeout=timeout
+        )
+        self._shadow = self._shadow._replace(lastPoint=pointNames[-1])
     
     # 0=low, 3=max
     def gripForce(self, amount):
-        self._addCmd(b'SETGRIPSTRENGTH ' + bytes(str(amount), 'UTF-8'))
+        self._addSetCmd(
+            b'SETGRIPSTRENGTH ' + bytes(str(amount), 'UTF-8'),
+            gripStrength=amount
+        )
     
-    def grip(self):
-        self._addCmd(b'CLOSE')
+    # the gripper state is shadowed but CLOSE/OPEN are always sent, since
+    # gripping again is a legitimate way to reseat a plate
+    def grip(self, timeout=DEFAULT_CMD_TIMEOUT):
+        self._addCmd(b'CLOSE', timeout=timeout)
+        self._shadow = self._shadow._replace(gripperClosed=True)
     
-    def release(self):
-        self._addCmd(b'OPEN')
+    def release(self, timeout=DEFAULT_CMD_TIMEOUT):
+        self._addCmd(b'OPEN', timeout=timeout)
+        self._shadow = self._shadow._replace(gripperClosed=False)
     
-    def getPoints(self):
+    def getPoints(self, timeout=POINTS_TIMEOUT):
         # prevent hanging when called before reset()
         if not self._workerThread or not self._workerThread.is_alive():
             return {}
         
-        self.pointStrs = {}
-        self.pointsRead = False
-        self.pointsLock.release()
-        while not self.pointsRead:
-            time.sleep(0.01)
-        self.pointsLock.acquire()
+        self._pointsRead.clear()
+        self._pointsRequested.set()
+        self._wake.set()
+        if not self._pointsRead.wait(timeout):
+            self._pointsRequested.clear()
+            raise CommandTimeout('robot timeout when reading points')
+        if self._pointsError:
+            raise self._pointsError
         
-        return self.pointStrs
+        return self._state.pointStrs
     
-    def close(self):
+    def close(self, timeout=CLOSE_TIMEOUT):
         self._runWorker = False
-        while not self._workerFinished:
-            time.sleep(0.01)
+        self._wake.set()
+        if self._workerThread:
+            self._workerThread.join(timeout)
+            if self._workerThread.is_alive():
+                # closing the port below makes the worker's next read fail,
+                # and with _runWorker cleared it exits instead of reconnecting
+                _log().warning('robot worker did not stop, closing port')
         if self._s:
             self._s.close()
             self._s = None
-        self.posnStr = b'0, 0, 0, 0\r\n'
+        self._state = self._state._replace(posnStr=b'0, 0, 0, 0\r\n', posnTime=None)
+        if self._telemetry:
+            self._telemetry.close()
+            self._telemetry = None
 
 
 if __name__ == '__main__':
+    import logging
     logging.basicConfig(level=logging.INFO)
     robot = PlateCrane()
     
@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+
+from platecrane_comms import PlateCrane
+
+# Run a program from programs/ (or any file) without the pendant:
+#   python3 platecrane_headless.py programs/Demo.py --port /dev/ttyUSB0
+# The program sees the robot as 'robot', as it does in the Program Linker,
+# and its command timings are recorded to the run journal (see
+# platecrane_journal.py) unless --no-journal is given. --profile prints where
+# the run's time went, per program line (see platecrane_profiler.py).
+# Only platecrane_comms is imported up front. The journal and the profiler
+# are imported when they are used, and tkinter, numpy and pyserial only if
+# something needs them. Warnings are printed by logging's default handler.
+
+
+# journalDir is where the run journal is kept: None for the default
+# (platecrane_journal.JOURNAL_DIR), '' for no journal
+def runProgram(programPath, robot, journalDir=None, profiler=None):
+    fileName = os.path.abspath(programPath)
+    with open(programPath) as programFile:
+        programText = programFile.read()
+    code = compile(programText, fileName, 'exec')
+    
+    journal = None
+    if (journalDir != ''):
+        from platecrane_journal import JOURNAL_DIR, RunJournal
+        program = os.path.splitext(os.path.basename(programPath))[0]
+        journal = RunJournal(program, fileName, journalDir or JOURNAL_DIR)
+        robot.journal = journal
+    error = None
+    if profiler:
+        profiler.start(robot)
+    try:
+        exec(code, {'__name__': '__platecrane_program__', 'robot': robot})
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        if profiler:
+            profiler.stop()
+        if journal:
+            robot.journal = None
+            journal.close(error)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run a PlateCrane program')
+    parser.add_argument('program')
+    parser.add_argument('--port', default='/dev/ttyUSB0',
+        help='robot serial port ("" for the dummy device)')
+    parser.add_argument('--config', default='config/')
+    parser.add_argument('--send-driver-params', action='store_true')
+    parser.add_argument('--home', action='store_true',
+        help='send system params and home the robot first')
+    parser.add_argument('--journal',
+        help='directory for the run journal (default: config/journal)')
+    parser.add_argument('--no-journal', dest='journal', action='store_const',
+        const='', help="don't record a run journal")
+    parser.add_argument('--profile', action='store_true',
+        help='print where the time went, per program line')
+    args = parser.parse_args(argv)
+    
+    robot = PlateCrane(
+        port=args.port,
+        config=args.config,
+        sendDriverParams=args.send_driver_params
+    )
+    try:
+        robot.reset(resume=not args.home)
+        profiler = None
+        if args.profile:
+            from platecrane_profiler import ProgramProfiler
+            profiler = ProgramProfiler(os.path.abspath(args.program))
+        runProgram(args.program, robot, args.journal, profiler)
+        if profiler:
+            print(profiler.report())
+    finally:
+        robot.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
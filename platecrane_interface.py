@@ -5,11 +5,33 @@ from functools import partial
 from tkinter import *
 from tkinter.messagebox import showerror
 
-from platecrane_comms import PlateCrane
-from platecrane_runner import drawPlatecraneRunner
+from platecrane_comms import PlateCrane, POLLERS, parseCoords
 
 APPNAME = 'PlateCrane interface'
 
+# keyboard jogging: key -> (axis, direction)
+JOG_KEYS = {
+    'Left': ('R', -1),
+    'Right': ('R', 1),
+    'Down': ('Y', -1),
+    'Up': ('Y', 1),
+    'Next': ('Z', -1),
+    'Prior': ('Z', 1),
+    'bracketleft': ('P', -1),
+    'bracketright': ('P', 1),
+}
+# X11 key autorepeat sends release/press pairs while a key is held; a
+# release followed by a press within this time doesn't stop the jog
+KEY_REPEAT_DEBOUNCE_MS = 60
+# while a jog button/key is held, the arm moves in steps that take about
+# this long at the jog speed, so it stops soon after release whatever the
+# jog distance is
+HOLD_JOG_TIME = 0.1 # seconds
+# step at full speed when the axis speeds aren't known (see SETSPEEDS)
+HOLD_JOG_STEP = 20
+# how long to wait for a fresh position before holding a jog
+HOLD_POSITION_WAIT = 0.5 # seconds
+
 def uiValToInt(uiVal):
     valStr = uiVal.get()
     try:
@@ -21,41 +43,132 @@ def entryWithVar(parent, label, var):
     Label(parent, text = label).pack(anchor=W)
     Entry(parent, textvariable = var).pack(anchor=W)
 
-def onJogClicked(uiJogDist, uiJogSpeed, robot, dirMul, axis):
+# back-to-back jogs of HOLD_JOG_TIME at 'speed' until stop is set. position
+# and input polling is paused meanwhile so nothing is sent between the jogs;
+# the workspace limits are checked against the position the jogs add up to.
+def holdJog(robot, stop, axis, direction, speed):
+    travel = robot.axisTravel(axis, HOLD_JOG_TIME)
+    if travel is None:
+        travel = HOLD_JOG_STEP * speed / 100
+    step = max(int(travel), 1) * direction
+    
+    # a position read after the first jog finished
+    since = time.time()
+    deadline = time.monotonic() + HOLD_POSITION_WAIT
+    while (robot.getState().posnTime or 0) <= since and time.monotonic() < deadline:
+        time.sleep(0.01)
+    state = robot.getState()
+    position = None
+    if robot.isPolling('position') and (state.posnTime or 0) > since:
+        position = parseCoords(state.posnStr)
+    
+    # (with no arguments these apply to every poller)
+    polling = [poller for poller in POLLERS if robot.isPolling(poller)]
+    if polling:
+        robot.pausePolling(*polling)
+    try:
+        while not stop.is_set():
+            if robot.limits and position:
+                robot.limits.checkJog(position, axis, step)
+            robot.jog(axis, step)
+            if position:
+                position[robot.axes.index(axis)] += step
+    finally:
+        if polling:
+            robot.resumePolling(*polling)
+
+# runs in its own thread: one jog of the jog distance per press, then small
+# steps until the button/key is released. other robot commands (Record,
+# GoTo, ...) wait for the jog in progress, see PlateCrane._addCmds().
+def jogWhileHeld(robot, jogState, stop, axis, dist, speed):
+    with jogState['lock']:
+        try:
+            # skipped by PlateCrane when the speed hasn't changed
+            robot.speed(speed)
+            robot.jog(axis, dist)
+            if not stop.is_set():
+                holdJog(robot, stop, axis, 1 if dist > 0 else -1, speed)
+        except Exception as e:
+            stop.set()
+            jogState['ui'].after(0, partial(
+                showerror,
+                title = APPNAME,
+                message = str(e)
+            ))
+
+def startJog(uiJogDist, uiJogSpeed, robot, jogState, dirMul, axis, e=None):
+    if jogState['stop']:
+        return
+    
     jogDist = uiValToInt(uiJogDist)
     jogSpeed = uiValToInt(uiJogSpeed)
+    if jogDist is None or jogSpeed is None:
+        showerror(
+            title = APPNAME,
+            message = 'jog speed and distance must be numbers'
+        )
+        return
     
-    robot.speed(jogSpeed)
-    robot.jog(axis, jogDist * dirMul)
+    stop = threading.Event()
+    jogState['stop'] = stop
+    threading.Thread(
+        target = jogWhileHeld,
+        args = (robot, jogState, stop, axis, jogDist * dirMul, jogSpeed),
+        daemon = True
+    ).start()
+
+def stopJog(jogState, e=None):
+    if jogState['stop']:
+        jogState['stop'].set()
+        jogState['stop'] = None
+
+def onJogKeyPress(uiJogDist, uiJogSpeed, robot, jogState, e):
+    # don't jog while typing in the entry boxes
+    if isinstance(e.widget, Entry):
+        return
+    
+    pendingStop = jogState['keyTimers'].pop(e.keysym, None)
+    if pendingStop:
+        # autorepeat: the key is still held
+        e.widget.after_cancel(pendingStop)
+        return
+    
+    axis, dirMul = JOG_KEYS[e.keysym]
+    startJog(uiJogDist, uiJogSpeed, robot, jogState, dirMul, axis)
 
-def drawJogger(parent, uiJogDist, uiJogSpeed, robot, axis):
+def onJogKeyRelease(jogState, e):
+    if isinstance(e.widget, Entry):
+        return
+    
+    jogState['keyTimers'][e.keysym] = e.widget.after(
+        KEY_REPEAT_DEBOUNCE_MS,
+        partial(onJogKeyReleased, jogState, e.keysym)
+    )
+
+def onJogKeyReleased(jogState, keysym):
+    jogState['keyTimers'].pop(keysym, None)
+    stopJog(jogState)
+
+def drawJogger(parent, uiJogDist, uiJogSpeed, robot, jogState, axis):
     jogPanel = Frame(parent)
     jogPanel.pack()
     
-    Button(
-        jogPanel,
-        text = axis + "-",
-        command = partial(
-            onJogClicked,
-            uiJogDist,
-            uiJogSpeed,
-            robot,
-            -1,
-            axis
+    for dirMul, text in [(-1, axis + "-"), (1, axis + "+")]:
+        jogBtn = Button(
+            jogPanel,
+            text = text
         )
-    ).pack(side='left')
-    Button(
-        jogPanel,
-        text = axis + "+",
-        command = partial(
-            onJogClicked,
+        jogBtn.pack(side='left')
+        jogBtn.bind('<ButtonPress-1>', partial(
+            startJog,
             uiJogDist,
             uiJogSpeed,
             robot,
-            1,
+            jogState,
+            dirMul,
             axis
-        )
-    ).pack(side='left')
+        ))
+        jogBtn.bind('<ButtonRelease-1>', partial(stopJog, jogState))
 
 def updatePosition(uiPosReadout, uiInputsReadout, robot):
     while True:
@@ -63,6 +176,11 @@ def updatePosition(uiPosReadout, uiInputsReadout, robot):
         uiInputsReadout.set(robot.getInputs())
         time.sleep(0.1)
 
+def onProgramLinkClicked(root, robot):
+    # the runner is only imported when it is first opened
+    from platecrane_runner import drawPlatecraneRunner
+    drawPlatecraneRunner(root, robot)
+
 def appExit(robot):
     robot.close()
     exit()
@@ -71,9 +189,17 @@ def onRecordClicked(robot, uiCurrPoint, uiPointsList):
     robot.here(uiCurrPoint.get())
     updatePointsList(robot, uiPointsList)
 
+# the point name can be a pattern, e.g. rack1_* deletes a whole rack
 def onDeleteClicked(robot, uiCurrPoint, uiPointsList):
-    robot.clear(uiCurrPoint.get())
-    updatePointsList(robot, uiPointsList)
+    try:
+        robot.deletePoints(uiCurrPoint.get())
+    except Exception as e:
+        showerror(
+            title = APPNAME,
+            message = str(e)
+        )
+    # deletePoints() has just read the points back
+    updatePointsList(robot, uiPointsList, robot.getState().pointStrs)
 
 def gotoClicked(robot, uiCurrPoint, uiPointsList):
     robot.move(uiCurrPoint.get())
@@ -82,11 +208,22 @@ def gotoClicked(robot, uiCurrPoint, uiPointsList):
 def gripStrengthClicked(robot, strength):
     robot.gripForce(strength)
 
-def updatePointsList(robot, uiPointsList):
+def updatePointsList(robot, uiPointsList, points=None):
+    if points is None:
+        try:
+            points = robot.getPoints()
+        except Exception as e:
+            # keep showing the last list
+            showerror(
+                title = APPNAME,
+                message = str(e)
+            )
+            return
+    
     oldIndex = uiPointsList.curselection
     uiPointsList.delete(0, END)
     
-    for point in robot.getPoints():
+    for point in points:
         uiPointsList.insert(END, point)
     
     uiPointsList.curselection = oldIndex
@@ -120,6 +257,15 @@ def drawMainUi(root, robot):
     uiJogSpeed = StringVar()
     uiJogSpeed.set('100')
     
+    # shared by the jog buttons and keys. 'lock' keeps jogs from overlapping
+    # and 'stop' ends the current hold-to-jog
+    jogState = {
+        'lock': threading.Lock(),
+        'stop': None,
+        'keyTimers': {},
+        'ui': mainUi,
+    }
+    
     statPanel = Frame(frame)
     statPanel.pack()
     
@@ -127,7 +273,7 @@ def drawMainUi(root, robot):
         statPanel,
         text = "Program link",
         command = partial(
-            drawPlatecraneRunner,
+            onProgramLinkClicked,
             root,
             robot
         )
@@ -180,8 +326,18 @@ def drawMainUi(root, robot):
             uiJogDist,
             uiJogSpeed,
             robot,
+            jogState,
             axis
         )
+    for key in JOG_KEYS:
+        mainUi.bind(f'<KeyPress-{key}>', partial(
+            onJogKeyPress,
+            uiJogDist,
+            uiJogSpeed,
+            robot,
+            jogState
+        ))
+        mainUi.bind(f'<KeyRelease-{key}>', partial(onJogKeyRelease, jogState))
     
     gripStrPanel = Frame(frame)
     gripStrPanel.pack()
@@ -316,6 +472,8 @@ def onConnectClicked(root, parentWindow, uiDevName):
     
     try:
         robot = PlateCrane(port=devName, sendDriverParams=True)
+        # open the port now so a bad port name is reported here
+        robot.portInit()
     except Exception as e:
         showerror(
             title = APPNAME,
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import queue
+import re
+import statistics
+import sys
+import threading
+import time
+
+# Run journal: one JSON line per robot command a program sends, with the
+# program line that sent it, the point it used, how long it waited for the
+# serial link ('queue'), how long the robot took ('exec') and the result.
+# Each run ends with a summary line. Journals are kept per program in
+# config/journal/<program>.jsonl.
+#
+#   journal = RunJournal('Demo', programFile)
+#   robot.journal = journal
+#   ... run the program ...
+#   robot.journal = None
+#   journal.close(error)
+#
+# Recording only queues a tuple; formatting and file writes happen in a
+# background thread every FLUSH_INTERVAL seconds.
+#
+# Report on the recorded runs (cycle-time breakdown of the latest run and
+# steps that got slower than in earlier runs):
+#   python3 platecrane_journal.py Demo
+
+JOURNAL_DIR = 'config/journal'
+FLUSH_INTERVAL = 1.0 # seconds
+
+# steps this much slower than their median in earlier runs are reported
+REGRESSION_FACTOR = 1.2
+REGRESSION_MIN_SECONDS = 0.1
+
+POINT_CMD = re.compile(r'(?:MOVE(?:_[RYZP])?|HERE|DELETEPOINT|SETPOINT) ([^,\s]+)')
+
+
+class RunJournal:
+    # programFile is the filename the program was compiled with; commands are
+    # attributed to the innermost line of that file that led to them
+    def __init__(self, program, programFile=None, directory=JOURNAL_DIR,
+            flushInterval=FLUSH_INTERVAL):
+        self.program = program
+        self.programFile = programFile
+        self.runId = time.strftime('%Y%m%d-%H%M%S') + f'-{os.getpid()}'
+        self.path = os.path.join(directory, program + '.jsonl')
+        os.makedirs(directory, exist_ok=True)
+        
+        self._flushInterval = flushInterval
+        self._records = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._started = time.monotonic()
+        self._commands = 0
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+    
+    def _callerLine(self):
+        if not self.programFile:
+            return None
+        frame = sys._getframe(2)
+        while frame:
+            if (frame.f_code.co_filename == self.programFile):
+                return frame.f_lineno
+            frame = frame.f_back
+        return None
+    
+    # called by PlateCrane._addCmds() once a batch has finished. times holds
+    # (sent, done) monotonic times for each command the worker sent; queued
+    # is when _addCmds() was called, before waiting for other callers.
+    def recordBatch(self, cmds, queued, times, error):
+        self._commands += len(cmds)
+        self._records.put((
+            time.time(),
+            self._callerLine(),
+            cmds,
+            queued,
+            times,
+            error
+        ))
+    
+    def _format(self, record):
+        wallTime, line, cmds, queued, times, error = record
+        lines = []
+        ready = queued
+        for i, cmd in enumerate(cmds):
+            cmd = cmd.decode('UTF-8', 'replace')
+            point = POINT_CMD.match(cmd)
+            entry = {
+                'run': self.runId,
+                'program': self.program,
+                'line': line,
+                'cmd': cmd,
+                'point': point.group(1) if point else None,
+                'queue': None,
+                'exec': None,
+                'time': round(wallTime, 3),
+            }
+            if (i < len(times)):
+                sent, done = times[i]
+                entry['queue'] = round(sent - ready, 4)
+                entry['exec'] = round(done - sent, 4)
+                ready = done
+                failed = error and (i == len(times) - 1)
+                entry['result'] = _describe(error) if failed else 'ok'
+            else:
+                # never sent: an earlier command failed, or the link was busy
+                entry['result'] = 'not sent' if times else _describe(error)
+            lines.append(json.dumps(entry, separators=(',', ':')) + '\n')
+        return lines
+    
+    def _writer(self):
+        with open(self.path, 'a') as journalFile:
+            while True:
+                stopping = self._stop.wait(self._flushInterval)
+                lines = []
+                while True:
+                    try:
+                        record = self._records.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(record, dict):
+                        lines.append(json.dumps(record, separators=(',', ':')) + '\n')
+                    else:
+                        lines.extend(self._format(record))
+                if lines:
+                    journalFile.write(''.join(lines))
+                    journalFile.flush()
+                if stopping:
+                    return
+    
+    # write the run summary and everything still buffered
+    def close(self, error=None):
+        if self._stop.is_set():
+            return
+        self._records.put({
+            'run': self.runId,
+            'program': self.program,
+            'end': True,
+            'elapsed': round(time.monotonic() - self._started, 3),
+            'commands': self._commands,
+            'result': _describe(error) if error else 'ok',
+            'time': round(time.time(), 3),
+        })
+        self._stop.set()
+        self._thread.join()
+
+
+def _describe(error):
+    return f'{type(error).__name__}: {error}'
+
+
+# records from a journal file, grouped by run in the order they ran:
+# [(runId, [command records], summary record or None)]
+def loadRuns(path):
+    runs = {}
+    with open(path) as journalFile:
+        for line in journalFile:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            run = runs.setdefault(record['run'], [[], None])
+            if record.get('end'):
+                run[1] = record
+            else:
+                run[0].append(record)
+    return [(runId, cmds, end) for runId, (cmds, end) in runs.items()]
+
+# total time of each step (line and command) in a run, summed over repeats:
+# {(line, cmd): [count, queue, exec]}
+def stepTimes(cmds):
+    steps = {}
+    for record in cmds:
+        step = steps.setdefault((record['line'], record['cmd']), [0, 0.0, 0.0])
+        step[0] += 1
+        step[1] += record['queue'] or 0.0
+        step[2] += record['exec'] or 0.0
+    return steps
+
+def _stepName(step):
+    line, cmd = step
+    return f"line {line}: {cmd}" if line is not None else cmd
+
+def cycleBreakdown(cmds, end):
+    steps = stepTimes(cmds)
+    robotTime = sum(q + e for _, q, e in steps.values())
+    elapsed = end['elapsed'] if end else robotTime
+    
+    lines = []
+    for step, (count, queueTime, execTime) in sorted(
+            steps.items(), key=lambda s: -s[1][2]):
+        repeats = f' x{count}' if count > 1 else ''
+        share = execTime / elapsed * 100 if elapsed else 0.0
+        lines.append(
+            f'  {_stepName(step)}{repeats}: exec {execTime:.2f} s '
+            f'({share:.0f}%), queue {queueTime:.2f} s'
+        )
+    lines.append(
+        f'  outside robot commands: {max(elapsed - robotTime, 0.0):.2f} s'
+    )
+    return elapsed, lines
+
+# steps of the latest run that took longer than in earlier runs
+def regressions(runs, factor=REGRESSION_FACTOR, minSeconds=REGRESSION_MIN_SECONDS):
+    if (len(runs) < 2):
+        return []
+    
+    history = {}
+    for _, cmds, _ in runs[:-1]:
+        for step, (_, _, execTime) in stepTimes(cmds).items():
+            history.setdefault(step, []).append(execTime)
+    
+    found = []
+    for step, (_, _, execTime) in stepTimes(runs[-1][1]).items():
+        if step not in history:
+            continue
+        baseline = statistics.median(history[step])
+        if (execTime > baseline * factor and execTime - baseline > minSeconds):
+            found.append(
+                f'  {_stepName(step)}: {execTime:.2f} s '
+                f'(median {baseline:.2f} s over {len(history[step])} runs)'
+            )
+    return found
+
+def report(program, directory=JOURNAL_DIR, lastRuns=10):
+    path = os.path.join(directory, program + '.jsonl')
+    runs = loadRuns(path) if os.path.exists(path) else []
+    if not runs:
+        return f'{program}: no runs recorded'
+    
+    lines = [f'{program}: {len(runs)} runs']
+    for runId, cmds, end in runs[-lastRuns:]:
+        if end:
+            lines.append(
+                f"  {runId}: {end['elapsed']:.2f} s, {end['commands']} "
+                f"commands, {end['result']}"
+            )
+        else:
+            lines.append(f'  {runId}: {len(cmds)} commands, did not finish')
+    
+    runId, cmds, end = runs[-1]
+    elapsed, breakdown = cycleBreakdown(cmds, end)
+    lines.append(f'latest run {runId}, cycle time {elapsed:.2f} s:')
+    lines.extend(breakdown)
+    
+    slower = regressions(runs)
+    if slower:
+        lines.append('slower than earlier runs:')
+        lines.extend(slower)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='report on PlateCrane run journals')
+    parser.add_argument('programs', nargs='*',
+        help='programs to report on (default: every journal)')
+    parser.add_argument('--journal', default=JOURNAL_DIR)
+    parser.add_argument('--runs', type=int, default=10,
+        help='number of recent runs to list')
+    args = parser.parse_args(argv)
+    
+    programs = args.programs
+    if not programs:
+        if not os.path.isdir(args.journal):
+            print(f'no journals in {args.journal}')
+            return 1
+        programs = sorted(
+            name[:-6] for name in os.listdir(args.journal)
+            if name.endswith('.jsonl')
+        )
+    
+    for program in programs:
+        print(report(program, args.journal, args.runs))
+        print()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import ast
+import os
+
+from platecrane_comms import PlateCraneError, parseCoords
+
+# Workspace limit checking. The limits come from the SETLIMITS line in
+# config/system.params (min, max pairs in the same axis order as GETPOS) and
+# are checked locally, so bad points and jogs are caught without a round trip
+# to the controller. Tables of points are checked in one NumPy pass.
+# numpy is imported when the first WorkspaceLimits is made, so checkProgram()
+# still finds untaught points without it.
+
+AXES = ('R', 'Y', 'Z', 'P')
+
+np = None
+
+
+class LimitError(PlateCraneError):
+    pass
+
+
+class WorkspaceLimits:
+    # raises ImportError if numpy isn't installed
+    def __init__(self, lower, upper):
+        global np
+        import numpy as np
+        self.lower = np.asarray(lower, dtype=np.int64)
+        self.upper = np.asarray(upper, dtype=np.int64)
+    
+    # returns None if system.params has no SETLIMITS line
+    @classmethod
+    def fromConfig(cls, config='config/'):
+        with open(os.path.join(config, 'system.params'), 'r') as spFile:
+            for line in spFile:
+                if line.startswith('SETLIMITS '):
+                    values = [int(v) for v in line[10:].split(',')]
+                    return cls(values[0::2], values[1::2])
+        return None
+    
+    # boolean array, True where a coordinate is out of range. coords is one
+    # point or an (n, axes) array of points.
+    def violations(self, coords):
+        coords = np.asarray(coords, dtype=np.int64)
+        return (coords < self.lower) | (coords > self.upper)
+    
+    def contains(self, coords):
+        return not self.violations(coords).any()
+    
+    def _describe(self, name, coords, bad):
+        axes = ', '.join(
+            f'{AXES[i]}={coords[i]} ({self.lower[i]}..{self.upper[i]})'
+            for i in np.flatnonzero(bad)
+        )
+        return f'{name}: out of range: {axes}'
+    
+    # check a whole point table ({name: "r, y, z, p"}, as from getPoints) and
+    # return {name: problem} for every point that isn't usable
+    def checkPoints(self, pointStrs):
+        problems = {}
+        names = []
+        rows = []
+        for name, values in pointStrs.items():
+            coords = parseCoords(values)
+            if not coords or len(coords) != len(self.lower):
+                problems[name] = f'{name}: malformed point {values}'
+                continue
+            names.append(name)
+            rows.append(coords)
+        
+        if rows:
+            rows = np.array(rows, dtype=np.int64)
+            bad = self.violations(rows)
+            for i in np.flatnonzero(bad.any(axis=1)):
+                problems[names[i]] = self._describe(names[i], rows[i], bad[i])
+        
+        return problems
+    
+    # raise LimitError if jogging from position would leave the workspace
+    def checkJog(self, position, axis, dist):
+        target = np.array(position, dtype=np.int64)
+        target[AXES.index(axis)] += dist
+        bad = self.violations(target)
+        if bad.any():
+            raise LimitError(self._describe(f'JOG {axis},{dist}', target, bad))
+
+
+# find the points a program moves to: robot.move('A', ...) and
+# robot.moveThrough(['A', 'B']) with literal point names.
+# returns a list of (line number, point name).
+def programTargets(source):
+    targets = []
+    for node in ast.walk(ast.parse(source)):
+        if not isinstance(node, ast.Call) or not node.args:
+            continue
+        if not isinstance(node.func, ast.Attribute):
+            continue
+        
+        arg = node.args[0]
+        if (node.func.attr == 'move'):
+            names = [arg]
+        elif (node.func.attr == 'moveThrough' and isinstance(arg, ast.List)):
+            names = arg.elts
+        else:
+            continue
+        
+        for name in names:
+            if isinstance(name, ast.Constant) and isinstance(name.value, str):
+                targets.append((node.lineno, name.value))
+    
+    return sorted(targets)
+
+# check every point a program moves to against the point table and limits.
+# returns a list of problems, each prefixed with the program line number.
+def checkProgram(source, pointStrs, limits=None):
+    problems = []
+    pointProblems = limits.checkPoints(pointStrs) if limits else {}
+    for lineno, name in programTargets(source):
+        if name not in pointStrs:
+            problems.append(f'line {lineno}: {name}: point is not taught')
+        elif name in pointProblems:
+            problems.append(f'line {lineno}: {pointProblems[name]}')
+    return problems
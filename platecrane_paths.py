@@ -0,0 +1,149 @@
+import os
+import threading
+
+from platecrane_comms import parseCoords
+
+# Path recording and playback. A PathRecorder samples the robot's position
+# while it is jogged or moved by hand (motorsOff), simplifyPath() reduces the
+# samples to the few waypoints needed to stay within a tolerance, and
+# playPath() runs them as one pipelined move stream.
+#
+#   recorder = PathRecorder(robot)
+#   recorder.start()
+#   ... jog the robot along the path ...
+#   savePath('toReader', simplifyPath(recorder.stop(), tolerance=50))
+#   playPath(robot, 'toReader')
+#
+# Paths are stored in config/paths/<name>.path, one "r, y, z, p" waypoint
+# per line (the same format as LISTPOINTS). For playback each waypoint is
+# stored on the controller as point <name>_<index>.
+
+DEFAULT_SAMPLE_RATE = 10.0 # samples per second
+DEFAULT_TOLERANCE = 50 # max distance (in encoder counts) from the recording
+PATHS_DIR = 'paths'
+
+
+class PathRecorder:
+    def __init__(self, robot, rate=DEFAULT_SAMPLE_RATE):
+        self.robot = robot
+        self.rate = rate
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._wasPolling = True
+    
+    def start(self):
+        self.samples = []
+        self._stop.clear()
+        # position polling is paused while the motors are off, but that is
+        # exactly when the arm is being moved by hand
+        self._wasPolling = self.robot.isPolling('position')
+        self.robot.resumePolling('position')
+        self._thread = threading.Thread(target=self._record, daemon=True)
+        self._thread.start()
+    
+    def _record(self):
+        lastTime = None
+        while not self._stop.wait(1 / self.rate):
+            state = self.robot.getState()
+            # only take positions the worker read since the last sample
+            # (state.time also changes when inputs are read)
+            if state.posnTime is None or (state.posnTime == lastTime):
+                continue
+            lastTime = state.posnTime
+            
+            coords = parseCoords(state.posnStr)
+            if coords and (not self.samples or coords != self.samples[-1]):
+                self.samples.append(coords)
+    
+    # stop recording and return the raw samples
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if not self._wasPolling:
+            self.robot.pausePolling('position')
+        return self.samples
+
+
+def _distToSegment(p, a, b):
+    ab = [bi - ai for ai, bi in zip(a, b)]
+    ap = [pi - ai for ai, pi in zip(a, p)]
+    abLenSq = sum(v * v for v in ab)
+    if not abLenSq:
+        return sum(v * v for v in ap) ** 0.5
+    
+    t = max(0, min(1, sum(u * v for u, v in zip(ap, ab)) / abLenSq))
+    return sum((ai + t * v - pi) ** 2 for ai, v, pi in zip(a, ab, p)) ** 0.5
+
+# Ramer-Douglas-Peucker: keep the fewest points such that every sample is
+# within 'tolerance' of the simplified path
+def simplifyPath(points, tolerance=DEFAULT_TOLERANCE):
+    if (len(points) < 3):
+        return list(points)
+    
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        worstDist = 0
+        worst = None
+        for i in range(first + 1, last):
+            dist = _distToSegment(points[i], points[first], points[last])
+            if (dist > worstDist):
+                worstDist = dist
+                worst = i
+        
+        if worst is not None and worstDist > tolerance:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    
+    return [p for p, k in zip(points, keep) if k]
+
+
+def _pathFile(name, config):
+    return os.path.join(config, PATHS_DIR, name + '.path')
+
+def savePath(name, waypoints, config='config/'):
+    os.makedirs(os.path.join(config, PATHS_DIR), exist_ok=True)
+    with open(_pathFile(name, config), 'w') as pathFile:
+        for waypoint in waypoints:
+            pathFile.write(', '.join(str(int(v)) for v in waypoint) + '\n')
+
+def loadPath(name, config='config/'):
+    waypoints = []
+    with open(_pathFile(name, config), 'r') as pathFile:
+        for line in pathFile:
+            coords = parseCoords(line)
+            if coords:
+                waypoints.append(coords)
+    return waypoints
+
+def listPaths(config='config/'):
+    try:
+        files = os.listdir(os.path.join(config, PATHS_DIR))
+    except FileNotFoundError:
+        return []
+    return sorted(f[:-5] for f in files if f.endswith('.path'))
+
+def pathPointNames(name, count):
+    return [f'{name}_{i}' for i in range(count)]
+
+# make sure the controller holds the path's waypoints, then run them as one
+# pipelined move stream
+def playPath(robot, name, config='config/', timeout=None):
+    waypoints = loadPath(name, config)
+    names = pathPointNames(name, len(waypoints))
+    
+    # only (re)send waypoints the controller doesn't already have
+    known = robot.getPoints()
+    robot.setPoints({
+        pointName: waypoint
+        for pointName, waypoint in zip(names, waypoints)
+        if (parseCoords(known.get(pointName)) != waypoint)
+    })
+    
+    robot.moveThrough(names, timeout=timeout)
@@ -0,0 +1,99 @@
+import argparse
+import sys
+
+from platecrane_comms import PlateCrane, parseCoords
+
+# Bulk point tables. A points file has one point per line in the same form
+# LISTPOINTS uses ("name, r, y, z, p"); blank lines and lines starting with
+# '#' are ignored. Tables are uploaded with PlateCrane.setPoints(), which
+# sends every point as one pipelined batch and reads the table back once.
+#
+#   robot.setPoints(loadPointsFile('layouts/deck.points'))
+#   robot.setPoints(gridPoints('rack1', origin, (0, 900, 0, 0), (1270, 0, 0, 0), 8, 4))
+#   robot.deletePoints('rack1_*')
+#   robot.renamePoint('reader', 'reader_old')
+#
+# From the command line:
+#   python3 platecrane_points.py --port /dev/ttyUSB0 export deck.points
+#   python3 platecrane_points.py --port /dev/ttyUSB0 upload deck.points
+#   python3 platecrane_points.py --port /dev/ttyUSB0 delete 'rack1_*'
+#   python3 platecrane_points.py --port /dev/ttyUSB0 rename reader reader_old
+
+
+# {name: coords} from a points file
+def loadPointsFile(path):
+    points = {}
+    with open(path) as pointsFile:
+        for lineNum, line in enumerate(pointsFile, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, _, values = line.partition(',')
+            coords = parseCoords(values)
+            if not name.strip() or not coords:
+                raise ValueError(f'{path}:{lineNum}: bad point "{line}"')
+            points[name.strip()] = coords
+    return points
+
+# write a table of points, as from getPoints() ({name: "r, y, z, p"}) or
+# loadPointsFile() ({name: coords})
+def savePointsFile(path, points):
+    with open(path, 'w') as pointsFile:
+        for name, coords in sorted(points.items()):
+            if isinstance(coords, (str, bytes)):
+                coords = parseCoords(coords)
+            values = ', '.join(str(v) for v in coords)
+            pointsFile.write(f'{name}, {values}\n')
+
+# points laid out in a grid, e.g. the slots of a rack: origin is the first
+# slot's coordinates and rowPitch/colPitch are what each row and column
+# adds to them (all in GETPOS order). rows and columns are numbered from 1.
+def gridPoints(prefix, origin, rowPitch, colPitch, rows, cols,
+               nameFormat='{prefix}_{row}_{col}'):
+    points = {}
+    for row in range(rows):
+        for col in range(cols):
+            name = nameFormat.format(prefix=prefix, row=row + 1, col=col + 1)
+            points[name] = [
+                o + row * r + col * c
+                for o, r, c in zip(origin, rowPitch, colPitch)
+            ]
+    return points
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='bulk PlateCrane point edits')
+    parser.add_argument('--port', default='/dev/ttyUSB0',
+        help='robot serial port ("" for the dummy device)')
+    parser.add_argument('--config', default='config/')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('export').add_argument('file')
+    commands.add_parser('upload').add_argument('file')
+    commands.add_parser('delete').add_argument('pattern')
+    rename = commands.add_parser('rename')
+    rename.add_argument('old')
+    rename.add_argument('new')
+    args = parser.parse_args(argv)
+    
+    robot = PlateCrane(port=args.port, config=args.config)
+    try:
+        robot.reset(resume=True)
+        if (args.command == 'export'):
+            points = robot.getPoints()
+            savePointsFile(args.file, points)
+            print(f'{len(points)} points saved')
+        elif (args.command == 'upload'):
+            points = loadPointsFile(args.file)
+            robot.setPoints(points)
+            print(f'{len(points)} points uploaded')
+        elif (args.command == 'delete'):
+            names = robot.deletePoints(args.pattern)
+            print(f'{len(names)} points deleted')
+        elif (args.command == 'rename'):
+            robot.renamePoint(args.old, args.new)
+    finally:
+        robot.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
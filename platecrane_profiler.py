@@ -0,0 +1,202 @@
+import os
+import sys
+import threading
+import time
+
+# Profiler for user programs. While a program runs, a background thread
+# samples the program's thread every INTERVAL seconds and notes which line of
+# the program it is on and whether it is waiting for the robot (in
+# PlateCrane._addCmds(), getPoints() or readInput()). Every command the robot
+# runs is also recorded as a span (the time it waited for the serial worker
+# to pick it up and the time the robot took). report() combines the two per
+# program line:
+#
+#   total   wall time spent on the line (sampled)
+#   python  time running Python code rather than waiting for the robot
+#   queue   time commands waited to be sent (polling, other callers' commands)
+#   exec    time the robot took to carry commands out
+#
+# followed by a timeline of the run. saveFolded() writes the sampled stacks
+# in the "folded" format flame graph tools (flamegraph.pl, speedscope) read.
+#
+#   profiler = ProgramProfiler(programFile)
+#   profiler.start(robot)
+#   ... run the program ...
+#   profiler.stop()
+#   print(profiler.report())
+
+INTERVAL = 0.005 # seconds
+PROFILES_DIR = 'config/profiles'
+
+PYTHON = 'python'
+ROBOT = 'robot'
+
+
+class ProgramProfiler:
+    # programFile is the filename the program was compiled with
+    def __init__(self, programFile, interval=INTERVAL):
+        self.programFile = programFile
+        self.interval = interval
+        # (time, program line stack, kind) for each sample
+        self.samples = []
+        # (line, cmd, queued, sent, done) for each command
+        self.spans = []
+        self.started = None
+        self.stopped = None
+        
+        self._robot = None
+        self._journal = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    # profile the calling thread until stop(). command spans are recorded
+    # through robot.journal; a journal already attached keeps receiving them.
+    def start(self, robot):
+        from platecrane_comms import PlateCrane
+        self._waitCodes = {
+            PlateCrane._addCmds.__code__,
+            PlateCrane.getPoints.__code__,
+            PlateCrane.readInput.__code__,
+        }
+        
+        self._robot = robot
+        self._journal = robot.journal
+        robot.journal = self
+        
+        self._stop.clear()
+        self.started = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._sampler,
+            args=(threading.get_ident(),),
+            daemon=True
+        )
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.monotonic()
+        self._robot.journal = self._journal
+    
+    # program lines on the stack, outermost first, and what the innermost
+    # one is doing
+    def _programStack(self, frame):
+        stack = []
+        kind = PYTHON
+        while frame:
+            if frame.f_code in self._waitCodes:
+                kind = ROBOT
+            if (frame.f_code.co_filename == self.programFile):
+                stack.append(frame.f_lineno)
+            frame = frame.f_back
+        return tuple(reversed(stack)), kind
+    
+    def _sampler(self, threadId):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(threadId)
+            if frame is None:
+                continue
+            stack, kind = self._programStack(frame)
+            if stack:
+                self.samples.append((time.monotonic(), stack, kind))
+            del frame
+    
+    # called by PlateCrane._addCmds() like RunJournal.recordBatch()
+    def recordBatch(self, cmds, queued, times, error):
+        frame = sys._getframe(1)
+        line = None
+        while frame:
+            if (frame.f_code.co_filename == self.programFile):
+                line = frame.f_lineno
+                break
+            frame = frame.f_back
+        
+        ready = queued
+        for cmd, (sent, done) in zip(cmds, times):
+            self.spans.append((line, cmd.decode('UTF-8', 'replace'), ready, sent, done))
+            ready = done
+        
+        if self._journal:
+            self._journal.recordBatch(cmds, queued, times, error)
+    
+    # {line: [total, python, queue, exec, commands]}
+    def lineTimes(self):
+        lines = {}
+        for _, stack, kind in self.samples:
+            entry = lines.setdefault(stack[-1], [0.0, 0.0, 0.0, 0.0, 0])
+            entry[0] += self.interval
+            if (kind == PYTHON):
+                entry[1] += self.interval
+        for line, _, queued, sent, done in self.spans:
+            entry = lines.setdefault(line, [0.0, 0.0, 0.0, 0.0, 0])
+            entry[2] += sent - queued
+            entry[3] += done - sent
+            entry[4] += 1
+        return lines
+    
+    # runs of consecutive samples on the same line doing the same thing:
+    # [(start, end, line, kind)] in seconds from the start of the run
+    def timeline(self):
+        segments = []
+        for sampled, stack, kind in self.samples:
+            at = sampled - self.started
+            if segments and segments[-1][2:] == [stack[-1], kind]:
+                segments[-1][1] = at
+            else:
+                segments.append([max(at - self.interval, 0.0), at, stack[-1], kind])
+        return [tuple(s) for s in segments]
+    
+    def _source(self, line):
+        try:
+            with open(self.programFile) as programFile:
+                return programFile.read().split('\n')[line - 1].strip()
+        except (OSError, IndexError, TypeError):
+            return ''
+    
+    def report(self, maxSegments=40):
+        elapsed = (self.stopped or time.monotonic()) - self.started
+        out = [
+            f'{os.path.basename(self.programFile)}: {elapsed:.2f} s, '
+            f'{len(self.samples)} samples every {self.interval * 1000:.0f} ms, '
+            f'{len(self.spans)} robot commands',
+            '',
+            ' line   total  python   queue    exec  cmds  source',
+        ]
+        lines = self.lineTimes()
+        for line in sorted(lines, key=lambda l: -max(lines[l][0], lines[l][3])):
+            total, python, queueTime, execTime, count = lines[line]
+            out.append(
+                f'{line if line else "-":>5} {total:6.2f}s {python:6.2f}s '
+                f'{queueTime:6.2f}s {execTime:6.2f}s {count:5}  '
+                f'{self._source(line) if line else "(outside the program)"}'
+            )
+        
+        out += ['', 'timeline:']
+        segments = self.timeline()
+        for start, end, line, kind in segments[:maxSegments]:
+            cmds = [
+                s[1] for s in self.spans
+                if s[0] == line and start - self.interval <= s[3] - self.started <= end
+            ] if (kind == ROBOT) else []
+            out.append(
+                f'  {start:7.2f}-{end:7.2f} s  line {line:<4} {kind:<6} '
+                + ', '.join(cmds[:3]) + (' ...' if len(cmds) > 3 else '')
+            )
+        if (len(segments) > maxSegments):
+            out.append(f'  ... {len(segments) - maxSegments} more')
+        return '\n'.join(out)
+    
+    # write the sampled stacks as "line 3;line 12;robot <count>" lines.
+    # returns the path written.
+    def saveFolded(self, name, directory=PROFILES_DIR):
+        counts = {}
+        for _, stack, kind in self.samples:
+            key = ';'.join(f'line {l}' for l in stack) + ';' + kind
+            counts[key] = counts.get(key, 0) + 1
+        
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name + '.folded')
+        with open(path, 'w') as foldedFile:
+            for key, count in sorted(counts.items()):
+                foldedFile.write(f'{key} {count}\n')
+        return path
@@ -8,6 +8,9 @@ from tkinter import *
 from tkinter.messagebox import showerror, askquestion
 from tkinter.filedialog import asksaveasfilename
 
+from platecrane_journal import RunJournal
+from platecrane_profiler import ProgramProfiler
+
 def updateProgramsList(uiProgramsList):
     oldIndex = uiProgramsList.curselection
     uiProgramsList.delete(0, END)
@@ -100,24 +103,104 @@ def exportClicked(uiProgramName):
                 npFile.write(interfaceCode + "\n" + programText)
         
 
-# removes the reference to this file from the error message
-def handleRunErr(ex, uiErrors):
+# shows the program lines the error came from, without the frames from this
+# file or platecrane_comms
+def handleRunErr(ex, uiErrors, programName):
     with StringIO() as exMsgFile:
-        traceback.print_exc(file=exMsgFile)
-        exMsg = exMsgFile.getvalue()[205:].replace(", in <module>\n", ": ")
-        uiErrors.set(exMsg)
+        for frame in traceback.extract_tb(ex.__traceback__):
+            if (frame.filename == programName):
+                exMsgFile.write(f"line {frame.lineno}: {frame.line}\n")
+        exMsgFile.write("".join(traceback.format_exception_only(type(ex), ex)))
+        uiErrors.set(exMsgFile.getvalue())
+
+# check the points the program moves to before running it. returns False
+# if the user decides not to run it.
+def confirmProgramPoints(programText, robot):
+    from platecrane_limits import checkProgram
+    
+    try:
+        points = robot.getPoints()
+    except Exception as ex:
+        response = askquestion(
+            title = "Program Linker",
+            message = f"Couldn't read the points to check them:\n{ex}\n\nRun anyway?"
+        )
+        return (response == 'yes')
+    if not points:
+        # not connected (or nothing taught); running it will say so
+        return True
+    
+    try:
+        problems = checkProgram(programText, points, robot.limits)
+    except SyntaxError:
+        return True
+    if not problems:
+        return True
+    
+    response = askquestion(
+        title = "Program Linker",
+        message = "\n".join(problems) + "\n\nRun anyway?"
+    )
+    return (response == 'yes')
+
+# shows where a profiled run's time went, per program line
+def drawProfile(title, profileText):
+    profileUi = Toplevel()
+    profileUi.title(title)
+    
+    profileScroll = Scrollbar(profileUi)
+    profileScroll.pack(side=RIGHT, fill=Y)
+    profileView = Text(
+        profileUi,
+        yscrollcommand = profileScroll.set,
+        font = "TkFixedFont",
+        width = 100,
+        height = 30,
+        wrap = NONE
+    )
+    profileView.insert(END, profileText)
+    profileView.config(state=DISABLED)
+    profileView.pack(side=LEFT, fill=BOTH, expand=True)
+    profileScroll.config(command=profileView.yview)
 
-def runClicked(uiProgramName, uiErrors, robot):
+# set "profile" to True to sample the program while it runs and show where
+# its time went (see platecrane_profiler.py)
+def runClicked(uiProgramName, uiErrors, robot, profile=False):
     uiErrors.set("")
 
     programName = getProgramName(uiProgramName)
     
     if os.path.exists(programName):
         with open(programName) as programFile:
+            programText = programFile.read()
+            if not confirmProgramPoints(programText, robot):
+                return
+            
+            # record each command's timing (see platecrane_journal.py)
+            journal = RunJournal(uiProgramName.get(), programName)
+            robot.journal = journal
+            profiler = ProgramProfiler(programName) if profile else None
+            error = None
             try:
-                exec(programFile.read(), globals(), {"robot": robot})
+                code = compile(programText, programName, "exec")
+                if profiler:
+                    profiler.start(robot)
+                exec(code, globals(), {"robot": robot})
             except Exception as ex:
-                handleRunErr(ex, uiErrors)
+                error = ex
+                handleRunErr(ex, uiErrors, programName)
+            finally:
+                if profiler and profiler.started:
+                    profiler.stop()
+                robot.journal = None
+                journal.close(error)
+            
+            if profiler and profiler.started:
+                foldedPath = profiler.saveFolded(uiProgramName.get())
+                drawProfile(
+                    f"Profile: {uiProgramName.get()}",
+                    profiler.report() + f"\n\nflame graph stacks: {foldedPath}"
+                )
     else:
         showerror(
             title = "Program Linker",
@@ -205,6 +288,18 @@ def drawPlatecraneRunner(root, robot):
         )
     ).pack(side=LEFT)
     
+    Button(
+        programBtnsPanelBottom,
+        text = "Profile",
+        command = partial(
+            runClicked,
+            uiProgramName,
+            uiErrors,
+            robot,
+            True
+        )
+    ).pack(side=LEFT)
+    
     Label(
         frame,
         textvariable = uiErrors,
@@ -0,0 +1,312 @@
+import itertools
+import threading
+import time
+
+from platecrane_comms import PlateCraneError
+from platecrane_transfers import TransferLibrary
+
+# Job scheduler for workcells where several cranes share nests, hotels and
+# instruments. Each job names the resources it needs (nests, hotels,
+# instruments, or zones of shared airspace) and optionally a robot; the
+# scheduler runs as many jobs at once as the robots and resources allow.
+#
+#   scheduler = Scheduler({'left': leftCrane, 'right': rightCrane})
+#   a = scheduler.submitTransfer('hotel1', 'reader', claims=['reader'])
+#   b = scheduler.submitTransfer('reader', 'hotel2', after=[a])
+#   scheduler.start()
+#   scheduler.join()
+#   print(scheduler.report())
+#
+# A job gets all of its resources (and its robot) at once or none of them,
+# so jobs never wait while holding something another job needs, which rules
+# out deadlock. When a ready job can't start, its resources are reserved so
+# later, lower-priority jobs can't keep taking them and starve it.
+#
+# If a job fails, its robot is taken out of service (it may still hold a
+# plate) and jobs depending on the failed job are cancelled.
+#
+# Simulated cranes (PlateCrane(port="")) can be used to try out schedules.
+# The simulated controller keeps its own point table, so teach the nests
+# first, e.g. crane.setPoints({'hotel1': (...), 'reader': (...)}).
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job:
+    def __init__(self, action, claims, robot, priority, after, name):
+        self.action = action
+        self.claims = frozenset(claims)
+        self.robot = robot
+        self.priority = priority
+        self.after = list(after)
+        self.name = name
+        
+        self.state = PENDING
+        self.assignedRobot = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+    
+    # wait for the job to finish (or fail). returns False on timeout.
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+    
+    def __repr__(self):
+        return f'<Job {self.name} {self.state}>'
+
+
+def _robotKey(name):
+    return 'robot:' + name
+
+
+class Scheduler:
+    # robots maps robot names to PlateCrane-like objects. transfers optionally
+    # maps robot names to their TransferLibrary (created on demand otherwise).
+    def __init__(self, robots, transfers=None):
+        self.robots = dict(robots)
+        self.transfers = dict(transfers or {})
+        
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._pending = []
+        self._jobs = []
+        self._busy = set()
+        self._faulted = set()
+        self._running = 0
+        self._busyTime = {name: 0.0 for name in self.robots}
+        self._started = None
+        self._stopped = None
+        self._thread = None
+        self._runScheduler = False
+    
+    def submit(self, action, claims=(), robot=None, priority=0, after=(), name=None):
+        if robot is not None and robot not in self.robots:
+            raise ValueError(f'unknown robot {robot}')
+        
+        with self._cond:
+            seq = next(self._seq)
+            job = Job(
+                action,
+                claims,
+                robot,
+                priority,
+                after,
+                name or f'job{seq}'
+            )
+            job._order = (-priority, seq)
+            self._pending.append(job)
+            self._pending.sort(key=lambda j: j._order)
+            self._jobs.append(job)
+            self._cond.notify_all()
+        return job
+    
+    # transfer a plate between two nests; both nests are claimed
+    def submitTransfer(self, source, destination, claims=(), **kwargs):
+        def action(robot):
+            self._transfersFor(robot).transfer(source, destination)
+        
+        kwargs.setdefault('name', f'{source}->{destination}')
+        return self.submit(
+            action,
+            claims=set(claims) | {source, destination},
+            **kwargs
+        )
+    
+    def _transfersFor(self, robot):
+        for name, candidate in self.robots.items():
+            if candidate is robot:
+                break
+        with self._cond:
+            if name not in self.transfers:
+                self.transfers[name] = TransferLibrary(robot)
+            return self.transfers[name]
+    
+    def start(self):
+        with self._cond:
+            if self._runScheduler:
+                return
+            self._runScheduler = True
+            if self._started is None:
+                self._started = time.monotonic()
+            self._stopped = None
+        self._thread = threading.Thread(target=self._dispatchLoop, daemon=True)
+        self._thread.start()
+    
+    # stop dispatching new jobs; running jobs are allowed to finish
+    def stop(self):
+        with self._cond:
+            self._runScheduler = False
+            self._stopped = time.monotonic()
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    # wait until every submitted job has finished, failed or been cancelled.
+    # returns False on timeout.
+    def join(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not self._pending and not self._running,
+                timeout
+            )
+    
+    def _dispatchLoop(self):
+        with self._cond:
+            while self._runScheduler:
+                self._dispatch()
+                self._cond.wait()
+    
+    def _cancel(self, job, error):
+        job.state = CANCELLED
+        job.error = error
+        job.finished = time.monotonic()
+        self._pending.remove(job)
+        job._done.set()
+    
+    def _pickRobot(self, job, unavailable):
+        candidates = [job.robot] if job.robot else list(self.robots)
+        free = [
+            name for name in candidates
+            if name not in self._faulted and _robotKey(name) not in unavailable
+        ]
+        if not free:
+            return None
+        # spread work across robots
+        return min(free, key=lambda name: self._busyTime[name])
+    
+    # called with self._cond held
+    def _dispatch(self):
+        # a cancellation can cancel jobs already passed over in priority
+        # order, so go again until nothing changes
+        while self._dispatchPass():
+            pass
+        self._cond.notify_all()
+    
+    # returns True if any job was cancelled
+    def _dispatchPass(self):
+        reserved = set()
+        cancelled = False
+        for job in list(self._pending):
+            error = None
+            failedDeps = [d for d in job.after if d.state in (FAILED, CANCELLED)]
+            if failedDeps:
+                error = f'dependency {failedDeps[0].name} did not finish'
+            elif job.robot in self._faulted:
+                error = f'robot {job.robot} is out of service'
+            elif (len(self._faulted) == len(self.robots)):
+                error = 'every robot is out of service'
+            if error:
+                self._cancel(job, PlateCraneError(f'{job.name}: {error}'))
+                cancelled = True
+                continue
+            if any(d.state != DONE for d in job.after):
+                continue
+            
+            unavailable = self._busy | reserved
+            robotName = self._pickRobot(job, unavailable)
+            if robotName is None or (job.claims & unavailable):
+                reserved |= job.claims
+                if job.robot:
+                    reserved.add(_robotKey(job.robot))
+                continue
+            
+            self._pending.remove(job)
+            self._busy |= job.claims | {_robotKey(robotName)}
+            self._running += 1
+            job.state = RUNNING
+            job.assignedRobot = robotName
+            job.started = time.monotonic()
+            threading.Thread(
+                target=self._runJob,
+                args=(job, robotName),
+                daemon=True
+            ).start()
+        
+        return cancelled
+    
+    def _runJob(self, job, robotName):
+        try:
+            job.result = job.action(self.robots[robotName])
+            state = DONE
+        except Exception as e:
+            job.error = e
+            state = FAILED
+        
+        with self._cond:
+            job.finished = time.monotonic()
+            job.state = state
+            if (state == FAILED):
+                self._faulted.add(robotName)
+            self._busyTime[robotName] += job.finished - job.started
+            self._busy -= job.claims | {_robotKey(robotName)}
+            self._running -= 1
+            job._done.set()
+            self._cond.notify_all()
+    
+    # put a robot taken out of service by a failed job back to work
+    def restoreRobot(self, name):
+        with self._cond:
+            self._faulted.discard(name)
+            self._cond.notify_all()
+    
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            end = self._stopped or now
+            elapsed = end - self._started if self._started else 0.0
+            finished = [j for j in self._jobs if j.state == DONE]
+            waits = [j.started - j.submitted for j in self._jobs if j.started]
+            
+            robots = {}
+            for name in self.robots:
+                busy = self._busyTime[name]
+                # include the part of running jobs done so far
+                busy += sum(
+                    now - j.started for j in self._jobs
+                    if j.state == RUNNING and j.assignedRobot == name
+                )
+                robots[name] = {
+                    'busy': busy,
+                    'idle': max(elapsed - busy, 0.0),
+                    'utilization': busy / elapsed if elapsed else 0.0,
+                    'jobs': sum(1 for j in finished if j.assignedRobot == name),
+                    'inService': name not in self._faulted,
+                }
+            
+            return {
+                'elapsed': elapsed,
+                'done': len(finished),
+                'failed': sum(1 for j in self._jobs if j.state == FAILED),
+                'cancelled': sum(1 for j in self._jobs if j.state == CANCELLED),
+                'running': self._running,
+                'pending': len(self._pending),
+                'jobsPerHour': len(finished) * 3600 / elapsed if elapsed else 0.0,
+                'meanWait': sum(waits) / len(waits) if waits else 0.0,
+                'robots': robots,
+            }
+    
+    def report(self):
+        stats = self.stats()
+        lines = [
+            f"{stats['done']} done, {stats['failed']} failed, "
+            f"{stats['cancelled']} cancelled, {stats['running']} running, "
+            f"{stats['pending']} pending in {stats['elapsed']:.1f} s",
+            f"{stats['jobsPerHour']:.1f} jobs/hour, "
+            f"mean wait {stats['meanWait']:.1f} s",
+        ]
+        for name, robot in stats['robots'].items():
+            lines.append(
+                f"  {name}: {robot['jobs']} jobs, busy {robot['busy']:.1f} s, "
+                f"idle {robot['idle']:.1f} s "
+                f"({robot['utilization'] * 100:.0f}% utilized)"
+                + ('' if robot['inService'] else ', OUT OF SERVICE')
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,321 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from platecrane_comms import (
+    PlateCrane,
+    PlateCraneError,
+    CommunicationError,
+    CommandError,
+    CommandTimeout,
+)
+
+# Headless PlateCrane service. The server owns the serial connection and
+# clients talk to it over a TCP or Unix socket using JSON lines:
+#
+#   -> {"id": 1, "method": "move", "args": ["A"], "params": {"axes": ["Z", "*"]},
+#       "priority": 0}
+#   <- {"id": 1, "result": null}
+#   <- {"id": 2, "error": {"type": "CommandTimeout", "message": "..."}}
+#
+# Robot calls are run one at a time; when several are waiting, the one with
+# the highest priority goes first (ties in arrival order). Telemetry is
+# streamed after {"method": "subscribe", "params": {"interval": 0.1}}:
+#
+#   <- {"telemetry": {"time": ..., "position": "...", "inputs": "..."}}
+
+DEFAULT_TCP_ADDRESS = ('127.0.0.1', 7878)
+DEFAULT_TELEMETRY_INTERVAL = 0.1
+MIN_TELEMETRY_INTERVAL = 0.01
+
+# methods that go through the arbitration queue
+QUEUED_METHODS = {
+    'reset', 'move', 'jog', 'speed', 'grip', 'release', 'gripForce',
+    'here', 'clear', 'motorsOn', 'motorsOff', 'getPoints',
+    'setPoint', 'setPoints', 'deletePoints', 'renamePoint',
+    'runSequence', 'moveThrough', 'readInput',
+}
+# methods that only read state published by the serial worker, so they are
+# answered straight away
+DIRECT_METHODS = {'getPosition', 'getInputs'}
+
+ERROR_TYPES = {
+    cls.__name__: cls for cls in (
+        PlateCraneError, CommunicationError, CommandError, CommandTimeout
+    )
+}
+
+
+class RobotArbiter:
+    def __init__(self, robot):
+        self.robot = robot
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    # reply is called from the arbiter thread as reply(result, error)
+    def submit(self, method, args, params, reply, priority=0):
+        self._queue.put(
+            (-priority, next(self._seq), method, args, params, reply)
+        )
+    
+    def _run(self):
+        while True:
+            _, _, method, args, params, reply = self._queue.get()
+            try:
+                result = getattr(self.robot, method)(*args, **params)
+            except Exception as e:
+                reply(None, e)
+            else:
+                reply(result, None)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self._writeLock = threading.Lock()
+        self._telemetryInterval = None
+    
+    def _send(self, msg):
+        data = (json.dumps(msg) + '\n').encode('UTF-8')
+        with self._writeLock:
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except OSError:
+                # client went away; the read loop will notice and clean up
+                pass
+    
+    def _reply(self, reqId, result, error):
+        if error is None:
+            self._send({'id': reqId, 'result': result})
+        else:
+            self._send({'id': reqId, 'error': {
+                'type': type(error).__name__,
+                'message': str(error),
+            }})
+    
+    def _streamTelemetry(self):
+        robot = self.server.arbiter.robot
+        while self._telemetryInterval:
+            self._send({'telemetry': {
+                'time': time.time(),
+                'position': robot.getPosition(),
+                'inputs': robot.getInputs(),
+            }})
+            time.sleep(self._telemetryInterval)
+    
+    def _handle(self, req):
+        reqId = req.get('id')
+        method = req.get('method')
+        args = req.get('args') or []
+        params = req.get('params') or {}
+        robot = self.server.arbiter.robot
+        
+        if (method == 'subscribe'):
+            interval = max(
+                float(params.get('interval', DEFAULT_TELEMETRY_INTERVAL)),
+                MIN_TELEMETRY_INTERVAL
+            )
+            wasStreaming = bool(self._telemetryInterval)
+            self._telemetryInterval = interval
+            if not wasStreaming:
+                threading.Thread(
+                    target=self._streamTelemetry,
+                    daemon=True
+                ).start()
+            self._reply(reqId, None, None)
+        elif (method == 'unsubscribe'):
+            self._telemetryInterval = None
+            self._reply(reqId, None, None)
+        elif method in DIRECT_METHODS:
+            self._reply(reqId, getattr(robot, method)(*args, **params), None)
+        elif method in QUEUED_METHODS:
+            self.server.arbiter.submit(
+                method,
+                args,
+                params,
+                lambda result, error: self._reply(reqId, result, error),
+                priority=int(req.get('priority', 0))
+            )
+        else:
+            self._reply(reqId, None, ValueError(f'unknown method {method}'))
+    
+    def handle(self):
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+            except ValueError as e:
+                self._reply(None, None, e)
+                continue
+            try:
+                self._handle(req)
+            except Exception as e:
+                self._reply(req.get('id'), None, e)
+        
+        self._telemetryInterval = None
+
+
+class TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    
+    # a server that didn't shut down cleanly leaves its socket file behind,
+    # and binding to it fails. only remove it if nothing is listening.
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.server_address)
+            except ConnectionRefusedError:
+                os.unlink(self.server_address)
+            except OSError:
+                pass
+            finally:
+                probe.close()
+        super().server_bind()
+
+
+def makeServer(robot, tcpAddress=None, unixPath=None):
+    if unixPath:
+        server = UnixServer(unixPath, RequestHandler)
+    else:
+        server = TCPServer(tcpAddress or DEFAULT_TCP_ADDRESS, RequestHandler)
+    server.arbiter = RobotArbiter(robot)
+    return server
+
+
+# Client for the service above. Robot methods are proxied, so a client can
+# stand in for a PlateCrane in programs:
+#   robot = PlateCraneClient(('127.0.0.1', 7878))
+#   robot.move('A')
+class PlateCraneClient:
+    def __init__(self, address=DEFAULT_TCP_ADDRESS, priority=0, timeout=None):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.connect(address)
+        self._rfile = self._sock.makefile('rb')
+        self._writeLock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._pendingLock = threading.Lock()
+        self.priority = priority
+        self.timeout = timeout
+        self.onTelemetry = None
+        threading.Thread(target=self._readReplies, daemon=True).start()
+    
+    def _readReplies(self):
+        for line in self._rfile:
+            msg = json.loads(line)
+            if 'telemetry' in msg:
+                if self.onTelemetry:
+                    self.onTelemetry(msg['telemetry'])
+                continue
+            with self._pendingLock:
+                waiter = self._pending.pop(msg.get('id'), None)
+            if waiter:
+                waiter[1] = msg
+                waiter[0].set()
+        
+        # connection closed: wake everyone still waiting
+        with self._pendingLock:
+            for waiter in self._pending.values():
+                waiter[0].set()
+            self._pending.clear()
+    
+    def call(self, method, *args, **params):
+        reqId = next(self._ids)
+        waiter = [threading.Event(), None]
+        with self._pendingLock:
+            self._pending[reqId] = waiter
+        
+        data = json.dumps({
+            'id': reqId,
+            'method': method,
+            'args': args,
+            'params': params,
+            'priority': self.priority,
+        }) + '\n'
+        with self._writeLock:
+            self._sock.sendall(data.encode('UTF-8'))
+        
+        if not waiter[0].wait(self.timeout):
+            with self._pendingLock:
+                self._pending.pop(reqId, None)
+            raise CommandTimeout(f'{method}: no reply from server')
+        
+        msg = waiter[1]
+        if msg is None:
+            raise CommunicationError('connection to server closed')
+        if 'error' in msg:
+            err = msg['error']
+            raise ERROR_TYPES.get(err['type'], PlateCraneError)(err['message'])
+        return msg.get('result')
+    
+    def subscribe(self, callback, interval=DEFAULT_TELEMETRY_INTERVAL):
+        self.onTelemetry = callback
+        self.call('subscribe', interval=interval)
+    
+    def unsubscribe(self):
+        self.call('unsubscribe')
+        self.onTelemetry = None
+    
+    def close(self):
+        self._sock.close()
+    
+    def __getattr__(self, name):
+        if name in QUEUED_METHODS or name in DIRECT_METHODS:
+            return lambda *args, **params: self.call(name, *args, **params)
+        raise AttributeError(name)
+
+
+def parseTcpAddress(addr):
+    host, port = addr.rsplit(':', 1)
+    return (host, int(port))
+
+def main():
+    parser = argparse.ArgumentParser(description='headless PlateCrane service')
+    parser.add_argument('--port', default='/dev/ttyUSB0',
+        help='robot serial port ("" for the dummy device)')
+    parser.add_argument('--config', default='config/')
+    parser.add_argument('--send-driver-params', action='store_true')
+    parser.add_argument('--home', action='store_true',
+        help='send system params and home the robot on startup')
+    parser.add_argument('--tcp', type=parseTcpAddress,
+        default=DEFAULT_TCP_ADDRESS, help='HOST:PORT to listen on')
+    parser.add_argument('--unix', help='listen on this Unix socket instead')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    robot = PlateCrane(
+        port=args.port,
+        config=args.config,
+        sendDriverParams=args.send_driver_params
+    )
+    robot.reset(resume=not args.home)
+    
+    server = makeServer(robot, tcpAddress=args.tcp, unixPath=args.unix)
+    logging.info(f'serving PlateCrane on {server.server_address}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix:
+            os.unlink(args.unix)
+        robot.close()
+
+
+if __name__ == '__main__':
+    main()
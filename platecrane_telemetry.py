@@ -0,0 +1,220 @@
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+# Shared-memory telemetry ring. The serial worker of a PlateCrane publishes
+# a sample whenever its state changes (see PlateCrane.publishTelemetry), and
+# any number of local processes can read them without touching the serial
+# link.
+#
+# Layout (little endian):
+#   header: magic, version, slot count, slot size, writer pid, pad,
+#           samples published (u64)
+#   slots:  seq (u32), pad, time (f64), position (4 x i32),
+#           inputs (u64, bit n = input n on), inputs read (u64 mask),
+#           command state (u8), pad
+#
+# Each slot is protected by a seqlock: the writer makes seq odd while it
+# updates the slot and even again when done, so a reader that sees the same
+# even seq before and after copying the slot got a consistent sample.
+#
+# One segment has one writer. Give each PlateCrane its own name when several
+# publish from the same machine; a name still in use by a live writer is
+# refused, and only a segment whose writer has died is reclaimed.
+
+DEFAULT_NAME = 'platecrane'
+DEFAULT_SLOTS = 256
+MAGIC = b'PCTM'
+VERSION = 2
+
+HEADER = struct.Struct('<4sIIII4xQ')
+SLOT = struct.Struct('<I4xd4iQQB7x')
+SEQ = struct.Struct('<I')
+COUNT = struct.Struct('<Q')
+COUNT_OFFSET = HEADER.size - COUNT.size
+
+CMD_IDLE = 0
+CMD_BUSY = 1
+CMD_ERROR = 2
+
+Sample = namedtuple('Sample', ['time', 'position', 'inputs', 'inputsRead', 'cmdState'])
+
+# give up on a slot that stays mid-write this many times (the writer died)
+MAX_READ_ATTEMPTS = 1000
+
+
+def _slotOffset(index):
+    return HEADER.size + index * SLOT.size
+
+# segments written from this process
+_owned = set()
+
+# attach to an existing segment without taking ownership of it
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # before python 3.13 attaching registers the segment with the
+        # resource tracker, which would unlink it when we exit. a writer in
+        # this process has registered it already; leave that registration.
+        shm = shared_memory.SharedMemory(name)
+        if shm._name not in _owned:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+def _processAlive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class TelemetryWriter:
+    def __init__(self, name=DEFAULT_NAME, slots=DEFAULT_SLOTS):
+        self._slots = slots
+        self._count = 0
+        size = _slotOffset(slots)
+        try:
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            self._reclaim(name)
+            self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+        
+        _owned.add(self._shm._name)
+        self._buf = self._shm.buf
+        self._buf[:size] = bytes(size)
+        HEADER.pack_into(
+            self._buf, 0, MAGIC, VERSION, slots, SLOT.size, os.getpid(), 0
+        )
+    
+    # remove a segment left behind by a writer that didn't shut down
+    # cleanly. raises FileExistsError if it belongs to a live writer (or
+    # isn't ours to remove).
+    def _reclaim(self, name):
+        existing = _attach(name)
+        try:
+            magic, version, _, _, pid, _ = HEADER.unpack_from(existing.buf, 0)
+        except struct.error:
+            magic = version = pid = None
+        if (magic != MAGIC or version != VERSION):
+            existing.close()
+            raise FileExistsError(
+                f'shared memory {name} exists and is not a PlateCrane '
+                f'telemetry segment this version can reclaim'
+            )
+        if _processAlive(pid):
+            existing.close()
+            raise FileExistsError(
+                f'telemetry {name} is published by process {pid}; '
+                f'use another name for this robot'
+            )
+        existing.close()
+        existing.unlink()
+    
+    def publish(self, position, inputs, inputsRead, cmdState, t=None):
+        offset = _slotOffset(self._count % self._slots)
+        seq = SEQ.unpack_from(self._buf, offset)[0]
+        
+        SEQ.pack_into(self._buf, offset, seq + 1)
+        SLOT.pack_into(
+            self._buf, offset,
+            seq + 1,
+            time.time() if t is None else t,
+            *position,
+            inputs,
+            inputsRead,
+            cmdState
+        )
+        SEQ.pack_into(self._buf, offset, seq + 2)
+        
+        self._count += 1
+        COUNT.pack_into(self._buf, COUNT_OFFSET, self._count)
+    
+    def close(self):
+        self._buf = None
+        _owned.discard(self._shm._name)
+        self._shm.close()
+        self._shm.unlink()
+
+
+class TelemetryReader:
+    def __init__(self, name=DEFAULT_NAME):
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+        magic, version, self._slots, slotSize, _, _ = HEADER.unpack_from(self._buf, 0)
+        if (magic != MAGIC or version != VERSION or slotSize != SLOT.size):
+            self.close()
+            raise ValueError(f'{name} is not a PlateCrane telemetry segment')
+    
+    def _count(self):
+        return COUNT.unpack_from(self._buf, COUNT_OFFSET)[0]
+    
+    def _readSlot(self, index):
+        offset = _slotOffset(index)
+        for _ in range(MAX_READ_ATTEMPTS):
+            before = SEQ.unpack_from(self._buf, offset)[0]
+            if (before % 2):
+                continue
+            values = SLOT.unpack_from(self._buf, offset)
+            if (SEQ.unpack_from(self._buf, offset)[0] == before):
+                return Sample(
+                    values[1],
+                    values[2:6],
+                    values[6],
+                    values[7],
+                    values[8]
+                )
+        return None
+    
+    # newest sample, or None if nothing was published yet
+    def latest(self):
+        count = self._count()
+        if not count:
+            return None
+        return self._readSlot((count - 1) % self._slots)
+    
+    # up to n most recent samples, oldest first
+    def recent(self, n):
+        count = self._count()
+        n = min(n, count, self._slots)
+        samples = []
+        for i in range(count - n, count):
+            sample = self._readSlot(i % self._slots)
+            if sample:
+                samples.append(sample)
+        
+        # slots overwritten while we were reading come back out of order
+        samples.sort(key=lambda s: s.time)
+        return samples
+    
+    def close(self):
+        self._buf = None
+        self._shm.close()
+
+
+def main():
+    name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_NAME
+    reader = TelemetryReader(name)
+    try:
+        while True:
+            sample = reader.latest()
+            if sample:
+                print(
+                    f'{sample.time:.3f} pos={sample.position} '
+                    f'inputs={sample.inputs:012x} cmd={sample.cmdState}'
+                )
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+from platecrane_comms import PlateCraneError, parseCoords
+
+# Plate pick/place macros. A nest is a taught point where a plate sits; its
+# approach and retreat poses are derived from the nest by fixed offsets, so
+# they don't have to be taught. The derived poses are stored on the controller
+# as <nest>_app / <nest>_ret and cached per nest, and each pick or place runs
+# as one pipelined command sequence:
+#
+#   transfers = TransferLibrary(robot, gripInput=22)
+#   transfers.transfer('hotel1', 'reader')
+#
+# If gripInput is set, the gripper sensor input is checked after gripping and
+# before placing, and a GripError is raised if no plate is held.
+
+# offsets, in the same axis order as GETPOS (r, y, z, p). adjust to the
+# crane: the approach pose must clear the nest and whatever surrounds it.
+DEFAULT_APPROACH_OFFSET = (0, 0, -1500, 0)
+
+APPROACH_SUFFIX = '_app'
+RETREAT_SUFFIX = '_ret'
+
+
+class GripError(PlateCraneError):
+    pass
+
+
+class TransferLibrary:
+    # retreatOffset defaults to approachOffset, i.e. leave the way we came
+    def __init__(self, robot, approachOffset=DEFAULT_APPROACH_OFFSET,
+                 retreatOffset=None, gripInput=None, gripInputOn=1):
+        self.robot = robot
+        self.approachOffset = tuple(approachOffset)
+        self.retreatOffset = tuple(retreatOffset or approachOffset)
+        self.gripInput = gripInput
+        self.gripInputOn = gripInputOn
+        # nest -> (nest coords, approach point, retreat point)
+        self._cache = {}
+    
+    def _offsetPoint(self, coords, offset):
+        return [c + o for c, o in zip(coords, offset)]
+    
+    # derive and upload the approach/retreat points for some nests up front
+    # (by default, for every nest already cached) in one batch. points are
+    # only re-sent when the nest has been re-taught.
+    def prepare(self, nests=None):
+        nests = list(self._cache) if nests is None else nests
+        points = self.robot.getPoints()
+        
+        derived = {}
+        cache = {}
+        for nest in nests:
+            coords = parseCoords(points.get(nest))
+            if not coords:
+                raise PlateCraneError(f'nest {nest} is not a taught point')
+            
+            cached = self._cache.get(nest)
+            if cached and cached[0] == coords:
+                continue
+            
+            approach = nest + APPROACH_SUFFIX
+            derived[approach] = self._offsetPoint(coords, self.approachOffset)
+            retreat = approach
+            if (self.retreatOffset != self.approachOffset):
+                retreat = nest + RETREAT_SUFFIX
+                derived[retreat] = self._offsetPoint(coords, self.retreatOffset)
+            
+            cache[nest] = (coords, approach, retreat)
+        
+        self.robot.setPoints(derived)
+        self._cache.update(cache)
+    
+    # forget cached poses, e.g. after re-teaching nests
+    def invalidate(self, nest=None):
+        if nest is None:
+            self._cache = {}
+        else:
+            self._cache.pop(nest, None)
+    
+    def _poses(self, nest):
+        if nest not in self._cache:
+            self.prepare([nest])
+        _, approach, retreat = self._cache[nest]
+        return approach, retreat
+    
+    def _checkHolding(self, nest):
+        if self.gripInput is None:
+            return
+        if (self.robot.readInput(self.gripInput) != self.gripInputOn):
+            raise GripError(f'{nest}: no plate in gripper')
+    
+    def pick(self, nest):
+        approach, retreat = self._poses(nest)
+        # lift to the approach height first, then travel, then descend
+        self.robot.runSequence([
+            'OPEN',
+            'MOVE_Z ' + approach,
+            'MOVE ' + approach,
+            'MOVE ' + nest,
+            'CLOSE',
+        ])
+        self._checkHolding(nest)
+        self.robot.runSequence(['MOVE ' + retreat])
+    
+    def place(self, nest):
+        approach, retreat = self._poses(nest)
+        self._checkHolding(nest)
+        self.robot.runSequence([
+            'MOVE_Z ' + approach,
+            'MOVE ' + approach,
+            'MOVE ' + nest,
+            'OPEN',
+            'MOVE ' + retreat,
+        ])
+    
+    def transfer(self, source, destination):
+        self.pick(source)
+        self.place(destination)
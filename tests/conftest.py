@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from platecrane_comms import PlateCrane
+
+
+# a PlateCrane on the simulated controller (DummySerialDevice), connected
+# without homing
+def makeCrane():
+    robot = PlateCrane(port='', config=os.path.join(ROOT, 'config', ''))
+    robot.reset(resume=True)
+    robot._s.latency = 0.001
+    return robot
+
+
+@pytest.fixture
+def crane():
+    robot = makeCrane()
+    yield robot
+    robot.close()
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pytest
+
+from platecrane_comms import (
+    PlateCrane,
+    DummySerialDevice,
+    CommunicationError,
+    CommandError,
+    CommandTimeout,
+)
+
+
+def test_read_input_other_than_fast_input(crane):
+    crane._s.inputs[3] = 1
+    assert crane.fastIoNum != 3
+    assert crane.readInput(3, timeout=2) == 1
+    assert crane.readInput(22, timeout=2) == 0
+
+
+def test_read_input_while_input_polling_paused(crane):
+    crane.pausePolling('inputs')
+    crane._s.inputs[5] = 1
+    assert crane.readInput(5, timeout=2) == 1
+
+
+def test_concurrent_commands_are_all_sent(crane):
+    sent = []
+    write = crane._s.write
+    def recordWrite(data):
+        sent.append(data)
+        write(data)
+    crane._s.write = recordWrite
+    
+    errors = []
+    def send(cmd):
+        try:
+            crane._addCmd(cmd)
+        except Exception as e:
+            errors.append(e)
+    threads = [
+        threading.Thread(target=send, args=(cmd,))
+        for cmd in (b'CLOSE', b'JOG R,10', b'OPEN')
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert not errors
+    for cmd in (b'CLOSE\r\n', b'JOG R,10\r\n', b'OPEN\r\n'):
+        assert cmd in sent
+
+
+def test_move_sends_nothing_without_time_left(crane):
+    sent = []
+    write = crane._s.write
+    def recordWrite(data):
+        sent.append(data)
+        write(data)
+    crane._s.write = recordWrite
+    
+    with pytest.raises(CommandTimeout):
+        crane.move('dummy', axes=['Z', '*'], timeout=0)
+    assert not any(data.startswith(b'MOVE') for data in sent)
+
+
+def garbleEchoes(crane, monkeypatch, prefix, count=1):
+    sent = []
+    write = crane._s.write
+    def garbled(data):
+        sent.append(data)
+        write(data)
+        if data.startswith(prefix) and (sum(d.startswith(prefix) for d in sent) <= count):
+            crane._s.lines[0] = b'\xff' + data[1:]
+    monkeypatch.setattr(crane._s, 'write', garbled)
+    return sent
+
+
+def test_input_read_is_retried(crane, monkeypatch):
+    crane.pausePolling()
+    crane._s.inputs[3] = 1
+    sent = garbleEchoes(crane, monkeypatch, b'READINP')
+    assert crane.readInput(3, timeout=2) == 1
+    assert sent.count(b'READINP 3\r\n') == 2
+
+
+def test_position_read_is_retried(crane, monkeypatch, caplog):
+    crane.pausePolling()
+    garbleEchoes(crane, monkeypatch, b'GETPOS')
+    crane._s.position = [9, 9, 9, 9]
+    crane.resumePolling('position')
+    deadline = time.monotonic() + 2
+    while (crane.getState().posnStr != b'9, 9, 9, 9\r\n'):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert 'attempt 1' in caplog.text
+
+
+def test_garbled_motion_echo_is_not_retried(crane, monkeypatch):
+    crane.pausePolling()
+    sent = garbleEchoes(crane, monkeypatch, b'MOVE')
+    with pytest.raises(CommandError):
+        crane.move('dummy')
+    assert sent.count(b'MOVE dummy\r\n') == 1
+
+
+def test_link_is_reopened_after_port_error(crane, monkeypatch):
+    monkeypatch.setattr(DummySerialDevice, 'latency', 0.001)
+    crane.pausePolling()
+    def unplugged(data):
+        raise OSError('device disconnected')
+    monkeypatch.setattr(crane._s, 'write', unplugged)
+    
+    # the first reopened port fails again straight away, as a flapping USB
+    # link does
+    opened = []
+    portInit = crane.portInit
+    def flappingPortInit():
+        portInit()
+        opened.append(crane._s)
+        if (len(opened) == 1):
+            def readall():
+                raise OSError('device disconnected')
+            crane._s.readall = readall
+    monkeypatch.setattr(crane, 'portInit', flappingPortInit)
+    
+    with pytest.raises(CommunicationError):
+        crane._addCmd(b'CLOSE', timeout=2)
+    crane._addCmd(b'OPEN', timeout=5)
+    assert (len(opened) == 2)
+    assert crane._workerThread.is_alive()
+
+
+def test_paused_worker_waits_for_work(crane, monkeypatch):
+    crane.pausePolling()
+    time.sleep(0.1)
+    loops = []
+    serviceLink = crane._serviceLink
+    def countLoops():
+        loops.append(time.monotonic())
+        serviceLink()
+    monkeypatch.setattr(crane, '_serviceLink', countLoops)
+    
+    time.sleep(0.5)
+    assert (len(loops) <= 10)
+    
+    # work still gets picked up straight away
+    start = time.monotonic()
+    crane.grip()
+    assert (time.monotonic() - start < 0.05)
@@ -0,0 +1,36 @@
+import threading
+import time
+
+from platecrane_interface import holdJog
+
+
+class RecordingLimits:
+    def __init__(self):
+        self.checked = []
+    
+    def checkJog(self, position, axis, dist):
+        self.checked.append(list(position))
+
+
+def test_held_jog_starts_from_position_after_first_jog(crane):
+    limits = RecordingLimits()
+    crane._limits = limits
+    crane._limitsLoaded = True
+    # slow enough that an input read lands between the first jog and the
+    # next position read
+    crane._s.latency = 0.02
+    crane.speed(50)
+    crane.jog('R', 500)
+    limits.checked = []
+    
+    stop = threading.Event()
+    thread = threading.Thread(target=holdJog, args=(crane, stop, 'R', 1, 50))
+    thread.start()
+    time.sleep(0.3)
+    stop.set()
+    thread.join(2)
+    
+    assert (limits.checked[0] == [501, 3, 5, 7])
+    # steps of HOLD_JOG_TIME at half of SETSPEEDS' 10000 counts/s
+    assert (limits.checked[1] == [1001, 3, 5, 7])
+    assert all(crane.isPolling(poller) for poller in ('position', 'inputs'))
@@ -0,0 +1,87 @@
+import json
+import threading
+
+import pytest
+
+from platecrane_comms import CommandError
+from platecrane_journal import RunJournal, regressions
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = RunJournal('Test', directory=str(tmp_path))
+    yield journal
+    journal.close()
+
+
+def entries(journal, cmds, times, error=None, queued=0.0):
+    return [
+        json.loads(line)
+        for line in journal._format((100.0, 7, cmds, queued, times, error))
+    ]
+
+
+def test_format_splits_queue_and_exec_time(journal):
+    move, close = entries(journal, [b'MOVE A', b'CLOSE'], [(0.5, 1.5), (1.75, 2.0)])
+    assert (move['point'] == 'A')
+    assert (move['line'] == 7)
+    assert (move['queue'], move['exec'], move['result']) == (0.5, 1.0, 'ok')
+    # the second command waited from the end of the first
+    assert (close['point'] is None)
+    assert (close['queue'], close['exec'], close['result']) == (0.25, 0.25, 'ok')
+
+
+def test_format_marks_failed_and_unsent_commands(journal):
+    error = CommandError('no plate')
+    move, close, open_ = entries(
+        journal, [b'MOVE A', b'CLOSE', b'OPEN'], [(0.0, 1.0), (1.0, 2.0)], error
+    )
+    assert (move['result'] == 'ok')
+    assert (close['result'] == 'CommandError: no plate')
+    assert (open_['result'] == 'not sent')
+    assert (open_['queue'] is None)
+    
+    # the worker never picked the batch up
+    move, = entries(journal, [b'MOVE A'], [], error)
+    assert (move['result'] == 'CommandError: no plate')
+
+
+def run(runId, *steps):
+    return (runId, [
+        {'line': line, 'cmd': cmd, 'queue': 0.0, 'exec': execTime}
+        for line, cmd, execTime in steps
+    ], None)
+
+def test_regressions_compare_latest_run_with_median():
+    earlier = [
+        run('1', (3, 'MOVE A', 1.0), (4, 'CLOSE', 0.2)),
+        run('2', (3, 'MOVE A', 1.1), (4, 'CLOSE', 0.2)),
+        run('3', (3, 'MOVE A', 1.0), (4, 'CLOSE', 0.2)),
+    ]
+    latest = run('4', (3, 'MOVE A', 1.5), (4, 'CLOSE', 0.28), (5, 'OPEN', 9.0))
+    found = regressions(earlier + [latest])
+    # CLOSE is 40% slower but by less than REGRESSION_MIN_SECONDS, and OPEN
+    # has no history
+    assert (len(found) == 1)
+    assert 'line 3: MOVE A: 1.50 s (median 1.00 s over 3 runs)' in found[0]
+    
+    assert (regressions(earlier) == [])
+    assert (regressions(earlier[:1]) == [])
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+    
+    def recordBatch(self, cmds, queued, times, error):
+        self.batches.append((queued, times))
+
+def test_queue_time_includes_waiting_for_other_callers(crane):
+    recorder = Recorder()
+    crane.journal = recorder
+    crane._callerLock.acquire()
+    threading.Timer(0.2, crane._callerLock.release).start()
+    crane.grip()
+    
+    queued, times = recorder.batches[0]
+    assert (times[0][0] - queued >= 0.2)
@@ -0,0 +1,63 @@
+import pytest
+
+from platecrane_limits import LimitError, WorkspaceLimits, checkProgram, programTargets
+
+PROGRAM = '''
+robot.move('A', axes=['Z', '*'])
+robot.moveThrough(['B', 'C'])
+robot.move(name)
+'''
+
+
+@pytest.fixture
+def limits():
+    pytest.importorskip('numpy')
+    return WorkspaceLimits([0, 0, -100, 0], [1000, 1000, 100, 360])
+
+
+def test_check_points(limits):
+    problems = limits.checkPoints({
+        'ok': ' 10, 10, 0, 0',
+        'high': ' 10, 2000, 0, 0',
+        'low': ' 10, 10, -500, -1',
+        'short': ' 1, 2, 3',
+        'garbled': ' 1, x, 3, 4',
+    })
+    assert (sorted(problems) == ['garbled', 'high', 'low', 'short'])
+    assert (problems['high'] == 'high: out of range: Y=2000 (0..1000)')
+    assert (problems['low'] == 'low: out of range: Z=-500 (-100..100), P=-1 (0..360)')
+    assert 'malformed' in problems['short']
+
+
+def test_check_jog(limits):
+    limits.checkJog([500, 500, 0, 0], 'R', 500)
+    with pytest.raises(LimitError, match='R=1001'):
+        limits.checkJog([500, 500, 0, 0], 'R', 501)
+
+
+def test_limits_from_config(tmp_path):
+    pytest.importorskip('numpy')
+    (tmp_path / 'system.params').write_text('SETCONFIG 11\nSETLIMITS -10,10,-20,20,-30,30,-40,40\n')
+    limits = WorkspaceLimits.fromConfig(str(tmp_path))
+    assert (list(limits.lower) == [-10, -20, -30, -40])
+    assert (list(limits.upper) == [10, 20, 30, 40])
+    
+    (tmp_path / 'system.params').write_text('SETCONFIG 11\n')
+    assert WorkspaceLimits.fromConfig(str(tmp_path)) is None
+
+
+def test_program_targets():
+    assert (programTargets(PROGRAM) == [(2, 'A'), (3, 'B'), (3, 'C')])
+
+
+# finding untaught points doesn't need numpy
+def test_check_program_without_limits():
+    pointStrs = {'A': ' 0, 0, 0, 0', 'C': ' 0, 0, 0, 0'}
+    assert (checkProgram(PROGRAM, pointStrs) == ['line 3: B: point is not taught'])
+
+
+def test_check_program_with_limits(limits):
+    pointStrs = {'A': ' 0, 0, 0, 0', 'B': ' 0, 0, 900, 0', 'C': ' 0, 0, 0, 0'}
+    assert (checkProgram(PROGRAM, pointStrs, limits) == [
+        'line 3: B: out of range: Z=900 (-100..100)'
+    ])
@@ -0,0 +1,73 @@
+import time
+
+from platecrane_paths import (
+    PathRecorder,
+    listPaths,
+    loadPath,
+    playPath,
+    savePath,
+    simplifyPath,
+)
+
+
+def test_simplify_keeps_corners_only():
+    line = [[i * 100, (i % 2) * 10, 0, 0] for i in range(11)]
+    assert (simplifyPath(line, tolerance=50) == [line[0], line[-1]])
+    assert (simplifyPath(line, tolerance=5) == line)
+    
+    corner = [[0, 0, 0, 0], [500, 0, 0, 0], [1000, 0, 0, 0], [1000, 500, 0, 0], [1000, 1000, 0, 0]]
+    assert (simplifyPath(corner) == [corner[0], corner[2], corner[4]])
+    
+    assert (simplifyPath(corner[:2]) == corner[:2])
+    # a path that comes back to where it started keeps its far end
+    there = [[0, 0, 0, 0], [1000, 0, 0, 0], [0, 0, 0, 0]]
+    assert (simplifyPath(there) == there)
+
+
+def test_save_and_load(tmp_path):
+    config = str(tmp_path)
+    waypoints = [[1, 2, 3, 4], [-5, 6, -7, 8]]
+    savePath('toReader', waypoints, config)
+    assert (loadPath('toReader', config) == waypoints)
+    assert (listPaths(config) == ['toReader'])
+    assert (listPaths(str(tmp_path / 'missing')) == [])
+
+
+def test_play_path(crane, tmp_path):
+    config = str(tmp_path)
+    waypoints = [[100, 0, 0, 0], [200, 50, 0, 0], [300, 50, 10, 0]]
+    savePath('p', waypoints, config)
+    
+    sent = []
+    write = crane._s.write
+    def recordWrite(data):
+        sent.append(data)
+        write(data)
+    crane._s.write = recordWrite
+    
+    playPath(crane, 'p', config)
+    assert (crane._s.points['p_1'] == [200, 50, 0, 0])
+    assert (crane._s.position == [300, 50, 10, 0])
+    assert (crane.getShadow().lastPoint == 'p_2')
+    
+    # the controller already has the waypoints the second time
+    del sent[:]
+    playPath(crane, 'p', config)
+    assert not any(data.startswith(b'SETPOINT') for data in sent)
+    assert ([data for data in sent if data.startswith(b'MOVE')]
+        == [b'MOVE p_0\r\n', b'MOVE p_1\r\n', b'MOVE p_2\r\n'])
+
+
+def test_recorder_samples_positions(crane):
+    recorder = PathRecorder(crane, rate=100)
+    crane.pausePolling()
+    recorder.start()
+    assert crane.isPolling('position')
+    for _ in range(3):
+        crane.jog('R', 100)
+        time.sleep(0.05)
+    samples = recorder.stop()
+    
+    assert not crane.isPolling('position')
+    assert (samples[-1] == [301, 3, 5, 7])
+    assert (samples == sorted(samples))
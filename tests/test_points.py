@@ -0,0 +1,112 @@
+import pytest
+
+from platecrane_comms import CommandError
+from platecrane_points import gridPoints, loadPointsFile, savePointsFile
+
+
+def test_grid_points():
+    points = gridPoints('rack1', (100, -2000, 300, 0), (0, -900, 0, 0),
+                        (1270, 0, 0, 0), 2, 3)
+    assert len(points) == 6
+    assert points['rack1_1_1'] == [100, -2000, 300, 0]
+    assert points['rack1_1_3'] == [2640, -2000, 300, 0]
+    assert points['rack1_2_1'] == [100, -2900, 300, 0]
+
+
+def test_grid_points_name_format():
+    points = gridPoints('h', (0, 0, 0, 0), (0, 0, 10, 0), (0, 0, 0, 0), 3, 1,
+                        nameFormat='{prefix}{row}')
+    assert points == {'h1': [0, 0, 0, 0], 'h2': [0, 0, 10, 0], 'h3': [0, 0, 20, 0]}
+
+
+def test_load_points_file(tmp_path):
+    path = tmp_path / 'deck.points'
+    path.write_text('# deck layout\n\nreader, 1, -2, 3, 4\n hotel1 ,5, 6, 7, 8\n')
+    assert loadPointsFile(path) == {
+        'reader': [1, -2, 3, 4],
+        'hotel1': [5, 6, 7, 8],
+    }
+
+
+def test_load_points_file_rejects_bad_lines(tmp_path):
+    path = tmp_path / 'bad.points'
+    path.write_text('reader, 1, 2, x, 4\n')
+    with pytest.raises(ValueError, match='bad.points:1'):
+        loadPointsFile(path)
+
+
+def test_save_points_file_round_trip(tmp_path):
+    path = tmp_path / 'deck.points'
+    # as from getPoints()
+    savePointsFile(path, {'b': ' 5, 6, 7, 8', 'a': ' 1, 2, 3, 4'})
+    assert path.read_text() == 'a, 1, 2, 3, 4\nb, 5, 6, 7, 8\n'
+    assert loadPointsFile(path) == {'a': [1, 2, 3, 4], 'b': [5, 6, 7, 8]}
+
+
+def test_set_points_is_one_batch_and_verified(crane, monkeypatch):
+    batches = []
+    addCmds = crane._addCmds
+    def recordBatches(cmds, *args, **kwargs):
+        batches.append(cmds)
+        return addCmds(cmds, *args, **kwargs)
+    monkeypatch.setattr(crane, '_addCmds', recordBatches)
+    
+    points = gridPoints('rack1', (100, -2000, 300, 0), (0, -900, 0, 0),
+                        (1270, 0, 0, 0), 4, 3)
+    crane.setPoints(points)
+    
+    assert len(batches) == 1
+    assert batches[0][0] == b'SETPOINT rack1_1_1, 100, -2000, 300, 0'
+    table = crane.getPoints()
+    assert all(name in table for name in points)
+
+
+def test_set_points_reports_points_not_stored(crane, monkeypatch):
+    respond = crane._s._respond
+    def dropPoint(data):
+        if data.startswith(b'SETPOINT lost,'):
+            return [b'00\x10\r\n']
+        return respond(data)
+    monkeypatch.setattr(crane._s, '_respond', dropPoint)
+    
+    with pytest.raises(CommandError, match='lost'):
+        crane.setPoints({'kept': (1, 2, 3, 4), 'lost': (5, 6, 7, 8)})
+
+
+def test_delete_and_rename_points(crane):
+    crane.setPoints(gridPoints('rack1', (0, 0, 0, 0), (0, -10, 0, 0),
+                               (10, 0, 0, 0), 2, 2))
+    
+    assert crane.deletePoints('rack1_1_*') == ['rack1_1_1', 'rack1_1_2']
+    crane.renamePoint('rack1_2_1', 'reader')
+    
+    table = crane.getPoints()
+    assert sorted(table) == ['dummy', 'rack1_2_2', 'reader']
+    assert table['reader'] == ' 0, -10, 0, 0'
+
+
+def test_points_command_line(tmp_path):
+    from platecrane_points import main
+    
+    path = tmp_path / 'deck.points'
+    path.write_text('a, 1, -2, 3, 4\n')
+    # each run starts a fresh simulated controller, so just check they work
+    main(['--port', '', 'upload', str(path)])
+    main(['--port', '', 'rename', 'dummy', 'moved'])
+    main(['--port', '', 'delete', 'dum*'])
+    main(['--port', '', 'export', str(tmp_path / 'out.points')])
+    assert loadPointsFile(tmp_path / 'out.points') == {'dummy': [0, 0, 0, 0]}
+
+
+def test_delete_single_point_lists_points_once(crane, monkeypatch):
+    crane.setPoints({'reader': (1, 2, 3, 4)})
+    listings = []
+    getPoints = crane.getPoints
+    def countListings(*args, **kwargs):
+        listings.append(1)
+        return getPoints(*args, **kwargs)
+    monkeypatch.setattr(crane, 'getPoints', countListings)
+    
+    assert crane.deletePoints('reader') == ['reader']
+    assert len(listings) == 1
+    assert 'reader' not in crane._s.points
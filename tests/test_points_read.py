@@ -0,0 +1,47 @@
+import pytest
+
+from platecrane_comms import CommunicationError, MAX_RETRIES
+
+
+def garbleListing(crane, monkeypatch, badReads):
+    respond = crane._s._respond
+    reads = []
+    def garbled(data):
+        lines = respond(data)
+        if (data == b'LISTPOINTS\r\n'):
+            reads.append(data)
+            if (len(reads) <= badReads):
+                lines[0] = b'du\xffmy, 0, 0,, 0\r\n'
+        return lines
+    monkeypatch.setattr(crane._s, '_respond', garbled)
+    return reads
+
+
+def test_garbled_listing_is_read_again(crane, monkeypatch):
+    reads = garbleListing(crane, monkeypatch, badReads=1)
+    assert crane.getPoints() == {'dummy': ' 0, 0, 0, 0'}
+    assert len(reads) == 2
+    # nothing was cleared
+    assert 'dummy' in crane._s.points
+
+
+def test_failed_read_is_reported(crane, monkeypatch):
+    respond = crane._s._respond
+    noise = iter(range(1000))
+    def noisy(data):
+        lines = respond(data)
+        if (data == b'LISTPOINTS\r\n'):
+            # different garbage every time, as line noise would be
+            lines[0] = bytes(f'x{next(noise)}, 0\r\n', 'UTF-8')
+        return lines
+    monkeypatch.setattr(crane._s, '_respond', noisy)
+    
+    with pytest.raises(CommunicationError):
+        crane.getPoints()
+    assert 'dummy' in crane._s.points
+
+
+def test_consistently_malformed_table_is_cleared(crane, monkeypatch):
+    garbleListing(crane, monkeypatch, badReads=MAX_RETRIES)
+    assert crane.getPoints() == {}
+    assert crane._s.points == {}
@@ -0,0 +1,61 @@
+import pytest
+
+from platecrane_profiler import ProgramProfiler, PYTHON, ROBOT
+
+
+@pytest.fixture
+def profiler():
+    profiler = ProgramProfiler('program.py', interval=0.01)
+    profiler.started = 0.0
+    profiler.stopped = 0.03
+    profiler.samples = [
+        (0.01, (1, 3), PYTHON),
+        (0.02, (1, 3), ROBOT),
+        (0.03, (5,), ROBOT),
+    ]
+    profiler.spans = [(3, 'MOVE A', 0.0, 0.005, 0.02)]
+    return profiler
+
+
+def test_line_times(profiler):
+    lines = profiler.lineTimes()
+    assert (lines[3] == pytest.approx([0.02, 0.01, 0.005, 0.015, 1]))
+    assert (lines[5] == pytest.approx([0.01, 0.0, 0.0, 0.0, 0]))
+
+
+def test_timeline(profiler):
+    assert (profiler.timeline() == [
+        (0.0, pytest.approx(0.01), 3, PYTHON),
+        (pytest.approx(0.01), pytest.approx(0.02), 3, ROBOT),
+        (pytest.approx(0.02), pytest.approx(0.03), 5, ROBOT),
+    ])
+
+
+def test_save_folded(profiler, tmp_path):
+    path = profiler.saveFolded('program', str(tmp_path))
+    with open(path) as foldedFile:
+        assert (foldedFile.read().splitlines() == [
+            'line 1;line 3;python 1',
+            'line 1;line 3;robot 1',
+            'line 5;robot 1',
+        ])
+
+
+# waiting for a points read or an input read is waiting on the robot too
+def test_reads_count_as_robot_time(crane, tmp_path):
+    programFile = str(tmp_path / 'program.py')
+    programText = 'robot.getPoints()\nrobot.readInput(3)\n'
+    crane._s.latency = 0.02
+    
+    profiler = ProgramProfiler(programFile)
+    profiler.start(crane)
+    try:
+        exec(compile(programText, programFile, 'exec'), {'robot': crane})
+    finally:
+        profiler.stop()
+    
+    kinds = {}
+    for _, stack, kind in profiler.samples:
+        kinds.setdefault(stack[-1], set()).add(kind)
+    assert (kinds[1] == {ROBOT})
+    assert (kinds[2] == {ROBOT})
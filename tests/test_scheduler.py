@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+
+from conftest import makeCrane
+from platecrane_scheduler import Scheduler, DONE, FAILED, CANCELLED
+
+
+@pytest.fixture
+def cranes():
+    robots = {'left': makeCrane(), 'right': makeCrane()}
+    yield robots
+    for robot in robots.values():
+        robot.close()
+
+
+def failingAction(robot):
+    raise RuntimeError('dropped plate')
+
+
+def test_transfers_on_simulated_cranes(cranes):
+    for robot in cranes.values():
+        robot.setPoints({'hotel1': (100, -2000, 3000, 0), 'reader': (5000, -100, 2000, 0)})
+    
+    scheduler = Scheduler(cranes)
+    there = scheduler.submitTransfer('hotel1', 'reader')
+    back = scheduler.submitTransfer('reader', 'hotel1', after=[there])
+    scheduler.start()
+    assert scheduler.join(timeout=30)
+    scheduler.stop()
+    
+    assert there.state == DONE, there.error
+    assert back.state == DONE, back.error
+    # the crane that did the last transfer finished at the hotel's retreat pose
+    robot = cranes[back.assignedRobot]
+    assert robot._s.position == [100, -2000, 1500, 0]
+
+
+def test_failed_job_cancels_dependents(cranes):
+    scheduler = Scheduler(cranes)
+    failed = scheduler.submit(failingAction, claims=['reader'], robot='left')
+    child = scheduler.submit(lambda robot: None, after=[failed])
+    grandchild = scheduler.submit(lambda robot: None, after=[child])
+    other = scheduler.submit(lambda robot: None, robot='right')
+    scheduler.start()
+    assert scheduler.join(timeout=10)
+    scheduler.stop()
+    
+    assert failed.state == FAILED
+    assert child.state == CANCELLED
+    assert grandchild.state == CANCELLED
+    assert other.state == DONE
+    # the robot that failed is out of service until restored
+    stats = scheduler.stats()
+    assert not stats['robots']['left']['inService']
+    assert stats['failed'] == 1
+    assert stats['cancelled'] == 2
+
+
+def test_blocked_job_reserves_its_claims(cranes):
+    release = threading.Event()
+    order = []
+    
+    def blocker(robot):
+        release.wait(10)
+    
+    def record(name):
+        def action(robot):
+            order.append(name)
+        return action
+    
+    scheduler = Scheduler(cranes)
+    scheduler.submit(blocker, claims=['x'], robot='left')
+    scheduler.start()
+    time.sleep(0.1)
+    
+    # 'high' can't start while 'x' is held; 'low' could run on the free
+    # robot, but 'y' is reserved for the waiting higher-priority job
+    high = scheduler.submit(record('high'), claims=['x', 'y'], priority=5)
+    low = scheduler.submit(record('low'), claims=['y'], priority=0)
+    time.sleep(0.2)
+    assert low.state != DONE
+    
+    release.set()
+    assert scheduler.join(timeout=10)
+    scheduler.stop()
+    assert order == ['high', 'low']
+    assert low.started >= high.finished
+
+
+def test_overlapping_claims_do_not_deadlock(cranes):
+    lock = threading.Lock()
+    holding = set()
+    conflicts = []
+    
+    def claimAction(claims):
+        def action(robot):
+            with lock:
+                if holding & claims:
+                    conflicts.append(claims)
+                holding.update(claims)
+            time.sleep(0.02)
+            with lock:
+                holding.difference_update(claims)
+        return action
+    
+    scheduler = Scheduler(cranes)
+    jobs = []
+    for i in range(12):
+        claims = [{'A', 'B'}, {'B', 'C'}, {'C', 'A'}][i % 3]
+        jobs.append(scheduler.submit(claimAction(claims), claims=claims, priority=i % 2))
+    scheduler.start()
+    assert scheduler.join(timeout=10)
+    scheduler.stop()
+    
+    assert all(job.state == DONE for job in jobs)
+    assert not conflicts
+
+
+def test_stats_and_report(cranes):
+    scheduler = Scheduler(cranes)
+    for i in range(4):
+        scheduler.submit(lambda robot: time.sleep(0.05), claims=[f'nest{i}'])
+    scheduler.start()
+    assert scheduler.join(timeout=10)
+    scheduler.stop()
+    
+    stats = scheduler.stats()
+    assert stats['done'] == 4
+    assert stats['pending'] == stats['running'] == 0
+    assert sum(robot['jobs'] for robot in stats['robots'].values()) == 4
+    for robot in stats['robots'].values():
+        assert 0.0 <= robot['utilization'] <= 1.0
+        assert robot['busy'] >= 0.05 * robot['jobs']
+    assert stats['jobsPerHour'] > 0
+    assert '4 done, 0 failed' in scheduler.report()
@@ -0,0 +1,114 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from platecrane_comms import PlateCraneError, CommandTimeout
+from platecrane_server import PlateCraneClient, RobotArbiter, makeServer
+
+
+def serve(robot, path):
+    server = makeServer(robot, unixPath=path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(crane, tmp_path):
+    path = str(tmp_path / 'platecrane.sock')
+    server = serve(crane, path)
+    client = PlateCraneClient(path, timeout=5)
+    yield client
+    client.close()
+    stop(server)
+
+
+def test_calls_are_answered(client):
+    client.setPoint('a', [1, 2, 3, 4])
+    assert (client.getPoints()['a'] == ' 1, 2, 3, 4')
+    client.move('a')
+    deadline = time.monotonic() + 2
+    while (client.getPosition() != '1, 2, 3, 4'):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_errors_keep_their_type(client):
+    with pytest.raises(CommandTimeout):
+        client.move('dummy', timeout=0)
+    with pytest.raises(PlateCraneError, match='unknown method'):
+        client.call('selfDestruct')
+
+
+def test_subscribers_get_telemetry(client):
+    samples = []
+    received = threading.Event()
+    def onTelemetry(sample):
+        samples.append(sample)
+        received.set()
+    client.subscribe(onTelemetry, interval=0.01)
+    assert received.wait(2)
+    client.unsubscribe()
+    assert 'position' in samples[0]
+
+
+class RecordingRobot:
+    def __init__(self):
+        self.calls = []
+        self.released = threading.Event()
+    
+    def hold(self):
+        self.released.wait(2)
+    
+    def record(self, value):
+        self.calls.append(value)
+
+def test_waiting_calls_run_highest_priority_first():
+    robot = RecordingRobot()
+    arbiter = RobotArbiter(robot)
+    done = threading.Semaphore(0)
+    reply = lambda result, error: done.release()
+    
+    arbiter.submit('hold', [], {}, reply)
+    time.sleep(0.05)
+    for value, priority in [('low', 0), ('high', 5), ('middle', 1), ('low2', 0)]:
+        arbiter.submit('record', [value], {}, reply, priority=priority)
+    robot.released.set()
+    for _ in range(5):
+        assert done.acquire(timeout=2)
+    assert (robot.calls == ['high', 'middle', 'low', 'low2'])
+
+
+def test_stale_socket_is_replaced(crane, tmp_path):
+    path = str(tmp_path / 'platecrane.sock')
+    stop(serve(crane, path))
+    # server_close() leaves the socket file behind, as a crash would
+    assert os.path.exists(path)
+    
+    server = serve(crane, path)
+    try:
+        client = PlateCraneClient(path, timeout=5)
+        assert client.getPosition()
+        client.close()
+        
+        # a running server's socket is left alone
+        with pytest.raises(OSError):
+            makeServer(crane, unixPath=path)
+    finally:
+        stop(server)
+
+
+def test_client_runs_transfers(client, crane):
+    from platecrane_transfers import TransferLibrary
+    crane._s.inputs[22] = 1
+    client.setPoints({'hotel': [0, 0, 5000, 0], 'reader': [100, 0, 5000, 0]})
+    TransferLibrary(client, gripInput=22).transfer('hotel', 'reader')
+    assert (crane._s.position == [100, 0, 3500, 0])
+    client.moveThrough(['hotel', 'reader'])
+    assert (crane._s.position == [100, 0, 5000, 0])
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from platecrane_comms import CommandError, DummySerialDevice, UNKNOWN_SHADOW
+
+
+def recordWrites(crane):
+    sent = []
+    write = crane._s.write
+    def recordWrite(data):
+        sent.append(data)
+        write(data)
+    crane._s.write = recordWrite
+    return sent
+
+
+def test_sequence_set_commands_update_shadow(crane):
+    sent = recordWrites(crane)
+    crane.speed(50)
+    crane.runSequence(['SPEED 20', 'MOVE dummy'])
+    assert (crane.getShadow().speed == 20)
+    assert (crane.getShadow().lastPoint == 'dummy')
+    crane.speed(50)
+    assert (sent.count(b'SPEED 50\r\n') == 2)
+    
+    crane.runSequence(['SETGRIPSTRENGTH 2', 'LIMP 0'])
+    assert (crane.getShadow().gripStrength == 2)
+    assert crane.getShadow().limp
+    assert (crane.getShadow().lastPoint is None)
+
+
+def test_unknown_sequence_command_forgets_shadow(crane):
+    crane.speed(50)
+    crane.runSequence(['SETACCEL 10'])
+    assert (crane.getShadow() == UNKNOWN_SHADOW)
+
+
+def test_redundant_set_commands_are_skipped(crane):
+    sent = recordWrites(crane)
+    crane.speed(50)
+    crane.speed(50)
+    crane.gripForce(2)
+    crane.gripForce(2)
+    crane.motorsOff()
+    crane.motorsOff()
+    assert (sent.count(b'SPEED 50\r\n') == 1)
+    assert (sent.count(b'SETGRIPSTRENGTH 2\r\n') == 1)
+    assert (sent.count(b'LIMP 0\r\n') == 1)
+    
+    crane.speed(60)
+    assert (sent.count(b'SPEED 60\r\n') == 1)
+    # gripping again reseats the plate, so it is always sent
+    crane.grip()
+    crane.grip()
+    assert (sent.count(b'CLOSE\r\n') == 2)
+
+
+def test_shadow_is_forgotten(crane):
+    sent = recordWrites(crane)
+    crane.speed(50)
+    crane.invalidateShadow()
+    crane.speed(50)
+    assert (sent.count(b'SPEED 50\r\n') == 2)
+    
+    crane.reset(resume=True)
+    assert (crane.getShadow() == UNKNOWN_SHADOW)
+
+
+def test_failed_command_forgets_shadow(crane, monkeypatch):
+    crane.speed(50)
+    respond = crane._s._respond
+    monkeypatch.setattr(crane._s, '_respond', lambda data: [b'ERR\r\n'])
+    with pytest.raises(CommandError):
+        crane.gripForce(1)
+    monkeypatch.setattr(crane._s, '_respond', respond)
+    assert (crane.getShadow() == UNKNOWN_SHADOW)
+
+
+def test_reopened_link_forgets_shadow(crane, monkeypatch):
+    monkeypatch.setattr(DummySerialDevice, 'latency', 0.001)
+    crane.speed(50)
+    crane.pausePolling()
+    
+    # unplugged while idle: no command fails, but the controller may have
+    # been power cycled
+    reopened = threading.Event()
+    portInit = crane.portInit
+    def notePortInit():
+        portInit()
+        reopened.set()
+    monkeypatch.setattr(crane, 'portInit', notePortInit)
+    def unplugged(data):
+        raise OSError('device disconnected')
+    monkeypatch.setattr(crane._s, 'write', unplugged)
+    crane.resumePolling('position')
+    assert reopened.wait(2)
+    # a position read on the new port means the reconnect has finished
+    since = time.time()
+    deadline = time.monotonic() + 2
+    while ((crane.getState().posnTime or 0) <= since):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    
+    sent = recordWrites(crane)
+    crane.speed(50)
+    assert (sent.count(b'SPEED 50\r\n') == 1)
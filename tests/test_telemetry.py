@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from platecrane_telemetry import HEADER, TelemetryReader, TelemetryWriter
+
+
+@pytest.fixture
+def name():
+    return f'platecrane_test_{os.getpid()}'
+
+
+def test_reader_sees_published_samples(name):
+    writer = TelemetryWriter(name, slots=4)
+    try:
+        for i in range(6):
+            writer.publish((i, 0, 0, 0), 1 << 3, 1 << 3, 0, t=float(i))
+        reader = TelemetryReader(name)
+        assert reader.latest().position == (5, 0, 0, 0)
+        assert [s.time for s in reader.recent(10)] == [2.0, 3.0, 4.0, 5.0]
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_name_in_use_is_refused(name):
+    writer = TelemetryWriter(name)
+    try:
+        with pytest.raises(FileExistsError, match='another name'):
+            TelemetryWriter(name)
+        # the first writer's segment is untouched
+        writer.publish((1, 2, 3, 4), 0, 0, 0)
+        reader = TelemetryReader(name)
+        assert reader.latest().position == (1, 2, 3, 4)
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_segment_of_dead_writer_is_reclaimed(name):
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    
+    stale = TelemetryWriter(name)
+    magic, version, slots, slotSize, _, count = HEADER.unpack_from(stale._buf, 0)
+    HEADER.pack_into(stale._buf, 0, magic, version, slots, slotSize, proc.pid, count)
+    # as if the writer had died without cleaning up
+    stale._buf = None
+    stale._shm.close()
+    
+    writer = TelemetryWriter(name)
+    try:
+        writer.publish((7, 7, 7, 7), 0, 0, 0)
+        reader = TelemetryReader(name)
+        assert reader.latest().position == (7, 7, 7, 7)
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_idle_worker_publishes_nothing(crane, name):
+    crane.publishTelemetry(name, slots=64)
+    reader = TelemetryReader(name)
+    try:
+        crane.pausePolling()
+        time.sleep(0.1)
+        count = reader._count()
+        time.sleep(0.3)
+        assert (reader._count() == count)
+        
+        crane.grip()
+        assert (reader._count() > count)
+    finally:
+        reader.close()